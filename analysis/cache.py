@@ -0,0 +1,134 @@
+# analysis/cache.py
+
+import asyncio
+import hashlib
+import logging
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import orjson
+from sqlalchemy import select
+
+from src.database import AsyncSessionLocal
+from models import Analysis, LLMCacheEntry, QuestionEmbedding, get_expiration_time
+from schemas import StatusEnum
+
+logger = logging.getLogger(__name__)
+
+
+def completion_cache_key(request: dict) -> str:
+    """
+    Hashes a chat completion request (model, messages, temperature, response_format, ...)
+    into a stable SHA-256 key. Keys are sorted so argument order never matters.
+    """
+    return hashlib.sha256(orjson.dumps(request, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+async def get_cached_completion(key: str) -> str | None:
+    """Returns the cached completion content for `key`, or None on a miss or expired entry."""
+    try:
+        async with AsyncSessionLocal() as session:
+            stmt = select(LLMCacheEntry.response).where(
+                LLMCacheEntry.key == key,
+                LLMCacheEntry.expires_at > datetime.now(timezone.utc),
+            )
+            return (await session.execute(stmt)).scalar_one_or_none()
+    except Exception as e:
+        # The cache is an optimization; a broken cache must never fail the job.
+        logger.warning("   ⚠️ LLM cache lookup failed: %s", e)
+        return None
+
+
+async def store_completion(key: str, response: str):
+    """Stores (or refreshes) the completion content for `key` for CACHE_TTL_HOURS."""
+    try:
+        async with AsyncSessionLocal() as session:
+            await session.merge(LLMCacheEntry(key=key, response=response, expires_at=get_expiration_time()))
+            await session.commit()
+    except Exception as e:
+        logger.warning("   ⚠️ LLM cache write failed: %s", e)
+
+
+# --- Semantic Question Cache ---
+
+# Cosine similarity at or above which two research questions are treated as the same.
+SEMANTIC_CACHE_THRESHOLD = 0.9
+# How often the in-process index is rebuilt from the database, dropping expired
+# analyses and picking up ones completed by other workers.
+SEMANTIC_INDEX_RELOAD_SECONDS = 300
+# Rows held in memory; a reload keeps the most recent analyses.
+SEMANTIC_INDEX_MAX_ENTRIES = 10_000
+
+
+class SemanticQuestionIndex:
+    """
+    In-process cosine-similarity index over the question embeddings of completed,
+    unexpired analyses. Embeddings are L2-normalized, so one matrix-vector product
+    scores every stored question at once. Rows live in a preallocated ring buffer,
+    so once the index is full each insert overwrites the oldest entry in place.
+    """
+
+    def __init__(self):
+        # Allocated on the first row, once the embedding width is known.
+        self._matrix: np.ndarray | None = None
+        self._analysis_ids: list[str | None] = [None] * SEMANTIC_INDEX_MAX_ENTRIES
+        self._head = 0  # Next row to write.
+        self._size = 0  # Rows in use; always the first `_size` rows.
+        self._loaded_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    async def _reload_if_stale(self):
+        if time.monotonic() - self._loaded_at < SEMANTIC_INDEX_RELOAD_SECONDS:
+            return
+        async with self._lock:
+            if time.monotonic() - self._loaded_at < SEMANTIC_INDEX_RELOAD_SECONDS:
+                return
+            async with AsyncSessionLocal() as session:
+                stmt = (
+                    select(QuestionEmbedding.analysis_id, QuestionEmbedding.embedding)
+                    .join(Analysis, Analysis.id == QuestionEmbedding.analysis_id)
+                    .where(Analysis.status == StatusEnum.COMPLETE, Analysis.expires_at > datetime.now(timezone.utc))
+                    .order_by(Analysis.created_at.desc())
+                    .limit(SEMANTIC_INDEX_MAX_ENTRIES)
+                )
+                rows = (await session.execute(stmt)).all()
+            # Oldest first, so the ring overwrites the oldest rows once it fills up.
+            rows.reverse()
+            if rows and self._matrix is None:
+                self._allocate(len(rows[0].embedding) // np.dtype(np.float32).itemsize)
+            for i, row in enumerate(rows):
+                self._matrix[i] = np.frombuffer(row.embedding, dtype=np.float32)
+                self._analysis_ids[i] = row.analysis_id
+            self._size = len(rows)
+            self._head = self._size % SEMANTIC_INDEX_MAX_ENTRIES
+            self._loaded_at = time.monotonic()
+
+    async def find_similar(self, embedding: np.ndarray) -> str | None:
+        """Returns the id of the most similar prior analysis, if it clears the threshold."""
+        try:
+            await self._reload_if_stale()
+        except Exception as e:
+            logger.warning("   ⚠️ Semantic index reload failed: %s", e)
+            return None
+        if self._size == 0:
+            return None
+        similarities = self._matrix[:self._size] @ embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] < SEMANTIC_CACHE_THRESHOLD:
+            return None
+        return self._analysis_ids[best]
+
+    def _allocate(self, dim: int):
+        self._matrix = np.empty((SEMANTIC_INDEX_MAX_ENTRIES, dim), dtype=np.float32)
+
+    def add(self, analysis_id: str, embedding: np.ndarray):
+        if self._matrix is None:
+            self._allocate(embedding.shape[0])
+        self._matrix[self._head] = embedding
+        self._analysis_ids[self._head] = analysis_id
+        self._head = (self._head + 1) % SEMANTIC_INDEX_MAX_ENTRIES
+        self._size = min(self._size + 1, SEMANTIC_INDEX_MAX_ENTRIES)
+
+
+semantic_question_index = SemanticQuestionIndex()
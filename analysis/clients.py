@@ -3,16 +3,32 @@ import os
 import httpx
 from openai import AsyncOpenAI
 
-openai_api_key = os.getenv("OPENAI_API_KEY")
-brightdata_api_key = os.getenv("BRIGHTDATA_API_KEY")
+def get_api_keys() -> tuple[str, str]:
+    """
+    Reads the OpenAI and BrightData API keys, failing fast with a single error
+    that lists every missing variable. Called once, when the clients are built.
+    """
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    brightdata_api_key = os.getenv("BRIGHTDATA_API_KEY")
+    missing = [name for name, value in (("OPENAI_API_KEY", openai_api_key), ("BRIGHTDATA_API_KEY", brightdata_api_key)) if not value]
+    if missing:
+        raise ValueError(f"Environment variable(s) not set: {', '.join(missing)}.")
+    return openai_api_key, brightdata_api_key
 
-if not openai_api_key:
-    raise ValueError("OPENAI_API_KEY environment variable not set.")
-if not brightdata_api_key:
-    raise ValueError("BRIGHTDATA_API_KEY environment variable not set.")
+openai_api_key, brightdata_api_key = get_api_keys()
 
+# Retries are handled by the tenacity policy in analysis/core.py, so the SDK's
+# own retry loop is disabled to avoid multiplying attempts. The SDK is given an
+# HTTP/2 pool so concurrent completions multiplex over a few warm connections.
 openai_client = AsyncOpenAI(
-    base_url="https://api.openai.com/v1"
+    api_key=openai_api_key,
+    base_url="https://api.openai.com/v1",
+    max_retries=0,
+    http_client=httpx.AsyncClient(
+        timeout=httpx.Timeout(60.0, connect=5.0),
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=60.0),
+        http2=True,
+    ),
 )
 
 BRIGHTDATA_API_URL = "https://api.brightdata.com/request"
@@ -21,8 +37,12 @@ brightdata_headers = {
     "Content-Type": "application/json",
 }
 
+# A single pooled HTTP/2 client is shared by every job so concurrent SERP
+# requests reuse warm connections instead of repeating the TLS handshake.
 brightdata_client = httpx.AsyncClient(
     base_url=BRIGHTDATA_API_URL,
     headers=brightdata_headers,
-    timeout=60.0,
+    timeout=httpx.Timeout(60.0, connect=5.0),
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=60.0),
+    http2=True,
 )
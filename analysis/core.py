@@ -1,15 +1,27 @@
 # analysis/core.py
 
 import asyncio
-import json
+import functools
+import logging
+import os
+import time
+import httpx
+import numpy as np
+import openai
+import orjson
 from datetime import datetime, timezone
 from typing import List
-from sqlalchemy import update
+from urllib.parse import urlencode
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
 
 # Import our new clients
 from analysis.clients import openai_client, brightdata_client
-from database import AsyncSessionLocal
-from models import Analysis
+from analysis.cache import completion_cache_key, get_cached_completion, store_completion, semantic_question_index
+from analysis.progress import notify_progress
+from src.database import AsyncSessionLocal
+from models import Analysis, QuestionEmbedding
 from schemas import (
     StatusEnum,
     FullAnalysisResult,
@@ -19,22 +31,272 @@ from schemas import (
     BrandVisibilityScore, # Added import
 )
 
+logger = logging.getLogger(__name__)
+
+# Caps on concurrent calls to each external API, shared by every running job.
+# Tune these against the account's rate limits rather than the job count.
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", 20))
+BRIGHTDATA_MAX_CONCURRENCY = int(os.getenv("BRIGHTDATA_MAX_CONCURRENCY", 10))
+OPENAI_SEMAPHORE = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+BRIGHTDATA_SEMAPHORE = asyncio.Semaphore(BRIGHTDATA_MAX_CONCURRENCY)
+
+# HTTP statuses worth retrying; anything else fails straight to the fallback.
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_RETRY_WAIT_SECONDS = 10
+
+# Collector results are reused for identical questions within this window.
+QUESTION_CACHE_TTL_SECONDS = 3600
+QUESTION_CACHE_MAX_ENTRIES = 512
+
+# Final results are written by one background task that commits every result
+# queued within this window in a single transaction.
+RESULT_BATCH_WINDOW_SECONDS = 0.05
+_result_queue: asyncio.Queue = asyncio.Queue()
+_result_writer_task: asyncio.Task | None = None
+
+# Jobs currently running the pipeline, keyed on the normalized research
+# question. Each future resolves to the saved result dict, or None on failure.
+_inflight_analyses: dict[str, asyncio.Future] = {}
+
+# Summarizing SERP snippets is a plain extraction task, so it runs on the
+# smaller, faster model.
+SERP_ANALYSIS_MODEL = "gpt-4o-mini"
+
+# Embedding model used to match paraphrased research questions.
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Token budget for the SERP snippets sent to the LLM, converted to characters
+# with OpenAI's ~4 characters-per-token rule of thumb for English text.
+SERP_CONTEXT_MAX_TOKENS = 1500
+SERP_CONTEXT_MAX_CHARS = SERP_CONTEXT_MAX_TOKENS * 4
+
+# Visibility scores given to ChatGPT's top 5 brands, by rank, when the web
+# analysis fails.
+FALLBACK_VISIBILITY_SCORES = (100, 80, 60, 40, 20)
+
+# Single-bar placeholder charts produced when no brands could be extracted.
+FALLBACK_VISUALIZATION_LABELS = {"Web analysis unavailable", "Brand data unavailable", "Analysis error", "No brands identified"}
+
+# Output budget for the ChatGPT call. It covers the JSON-escaped answer plus the
+# entities list, so it sits well above what a plain-text answer needs; a
+# truncated object does not parse and the whole answer falls back.
+CHATGPT_MAX_TOKENS = 2000
+
+# System messages are built once and shared by every request; keeping them
+# byte-identical also lets OpenAI's prompt caching reuse the prefix.
+SERP_ANALYST_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "You are an expert research analyst. Provide clear, structured analysis based on the given search results. Please provide a comprehensive analysis of the Google search result snippets you are given. Summarize the key findings, identify the main brands or topics discussed, and conclude with the most relevant insights.",
+}
+CHATGPT_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "You are a helpful assistant. Answer questions directly and clearly. Put your answer in the 'answer' field and list the names of relevant companies, technologies, tools, or key entities mentioned in your answer in the 'entities' field.",
+}
+VISUALIZATION_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": """You are a highly precise data analysis and extraction engine. Your only output must be a single, valid JSON object that strictly adheres to the requested format. Do not include any other text or apologies.
+
+The user will send a summary of web search results for a specific query.
+Your task is to identify the top 5 most prominent brands mentioned.
+
+You must perform the following steps:
+1.  **Identify Brands**: Scan the text to find all mentioned brand names.
+2.  **Count Mentions**: Tally the number of times each brand is mentioned.
+3.  **Assess Prominence**: Evaluate the prominence of each mention. Brands mentioned earlier, in headlines, or as primary recommendations are more prominent.
+4.  **Calculate Visibility Score**: Based on a combination of mention count and prominence, calculate a 'visibility_score' for each brand on a scale of 1 to 100.
+5.  **Rank Brands**: Rank the top 5 brands from 1 to 5 based on their score.
+6.  **Explain Methodology**: Briefly (1-2 sentences) explain the specific factors you used from the text to determine the scores. For example: "Scores were based on mention frequency and prominence in lists of 'best' brands."
+
+Your response MUST be a single, valid JSON object that strictly follows this structure:
+{
+  "top_5_brands": ["Brand A", "Brand B", ...],
+  "brand_scores": [
+    { "brand_name": "Brand A", "visibility_score": 95, "rank": 1, "mentions": 8 },
+    { "brand_name": "Brand B", "visibility_score": 90, "rank": 2, "mentions": 6 },
+    ...
+  ],
+  "methodology_explanation": "Your explanation here."
+}""",
+}
+
+# JSON schema for the single structured-output call that returns both the
+# answer and the entities it mentions.
+CHATGPT_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "chatgpt_response",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "answer": {"type": "string"},
+                "entities": {"type": "array", "items": {"type": "string"}},
+            },
+            "required": ["answer", "entities"],
+            "additionalProperties": False,
+        },
+    },
+}
+
 
 # --- Private Helper Functions for API Calls ---
 
+def _is_retryable(error: BaseException) -> bool:
+    """Transient transport failures, rate limits and 5xx responses are retried."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (
+        httpx.TransportError,
+        openai.RateLimitError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+    ))
+
+_exponential_backoff = wait_exponential_jitter(initial=1, max=MAX_RETRY_WAIT_SECONDS)
+
+def _wait_before_retry(retry_state) -> float:
+    """Honors a Retry-After header when the provider sends one, otherwise backs off with jitter."""
+    response = getattr(retry_state.outcome.exception(), "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), MAX_RETRY_WAIT_SECONDS)
+        except ValueError:
+            pass
+    return _exponential_backoff(retry_state)
+
+# Retries are applied outside the semaphores so a backing-off call does not hold a slot.
+_api_retry = retry(
+    retry=retry_if_exception(_is_retryable),
+    stop=stop_after_attempt(3),
+    wait=_wait_before_retry,
+    reraise=True,
+)
+
+@_api_retry
+async def _post_to_brightdata(payload: dict) -> httpx.Response:
+    async with BRIGHTDATA_SEMAPHORE:
+        response = await brightdata_client.post(url="/", json=payload)
+    if response.status_code in RETRYABLE_STATUS_CODES:
+        response.raise_for_status()
+    return response
+
+@_api_retry
+async def _stream_completion(**kwargs) -> tuple[str, str | None]:
+    """
+    Streams a chat completion and returns the concatenated content with its finish reason.
+    Closing the stream in `finally` stops token generation early if the job is cancelled.
+    """
+    async with OPENAI_SEMAPHORE:
+        stream = await openai_client.chat.completions.create(stream=True, **kwargs)
+        parts = []
+        finish_reason = None
+        try:
+            async for chunk in stream:
+                if chunk.choices:
+                    choice = chunk.choices[0]
+                    parts.append(choice.delta.content or "")
+                    finish_reason = choice.finish_reason or finish_reason
+        finally:
+            await stream.response.aclose()
+    return "".join(parts), finish_reason
+
+
+@_api_retry
+async def _create_completion(**kwargs):
+    """Makes a non-streaming chat completion call; SDK retries are off, so this retries instead."""
+    async with OPENAI_SEMAPHORE:
+        return await openai_client.chat.completions.create(**kwargs)
+
+
+async def _complete(parse, **kwargs):
+    """
+    Returns a chat completion's content run through `parse`, serving repeat prompts
+    from the persistent prompt-hash cache so identical requests cost neither tokens
+    nor latency. Only completions that finished normally and that `parse` accepts
+    are stored, so a truncated or malformed answer is never replayed.
+    """
+    key = completion_cache_key(kwargs)
+    cached = await get_cached_completion(key)
+    if cached is not None:
+        logger.info("   ♻️ Prompt cache hit (%s)", kwargs['model'])
+        return parse(cached)
+    content, finish_reason = await _stream_completion(**kwargs)
+    parsed = parse(content)
+    if finish_reason == "stop":
+        await store_completion(key, content)
+    else:
+        logger.warning("   ⚠️ Completion ended with finish_reason=%r, not caching it", finish_reason)
+    return parsed
+
+
+@_api_retry
+async def _embed_question(question: str) -> np.ndarray:
+    """Returns the L2-normalized float32 embedding of a research question."""
+    async with OPENAI_SEMAPHORE:
+        response = await openai_client.embeddings.create(model=EMBEDDING_MODEL, input=question.strip())
+    embedding = np.asarray(response.data[0].embedding, dtype=np.float32)
+    return embedding / np.linalg.norm(embedding)
+
+
+def _cache_by_question(is_cacheable):
+    """
+    Caches a collector's result per normalized question for QUESTION_CACHE_TTL_SECONDS.
+    Concurrent calls for the same question share one in-flight task instead of each
+    hitting the external APIs. Fallback results are rejected by `is_cacheable`.
+    """
+    def decorator(func):
+        cache = {}
+        in_flight = {}
+
+        def store(key, question, task):
+            in_flight.pop(key, None)
+            if task.cancelled() or task.exception() is not None:
+                return
+            result = task.result()
+            if not is_cacheable(question, result):
+                return
+            cache[key] = (time.monotonic() + QUESTION_CACHE_TTL_SECONDS, result)
+            if len(cache) > QUESTION_CACHE_MAX_ENTRIES:
+                cache.pop(next(iter(cache)))
+
+        @functools.wraps(func)
+        async def wrapper(question: str):
+            key = question.strip().lower()
+            cached = cache.get(key)
+            if cached and cached[0] > time.monotonic():
+                logger.info("   ♻️ Reusing cached %s result for: '%s'", func.__name__, question)
+                return cached[1]
+            task = in_flight.get(key)
+            if task is None:
+                task = asyncio.create_task(func(question))
+                in_flight[key] = task
+                task.add_done_callback(functools.partial(store, key, question))
+            # Shield the shared task so one cancelled caller does not cancel the others.
+            return await asyncio.shield(task)
+
+        return wrapper
+    return decorator
+
+def _chatgpt_fallback_message(question: str) -> str:
+    return f"I can provide information about '{question}', but I encountered an error accessing my knowledge base. For the most accurate and up-to-date information, I recommend consulting authoritative sources or conducting further research on this topic."
+
+
+@_cache_by_question(lambda question, result: result.source != "Fallback Analysis")
 async def _perform_web_analysis(question: str) -> WebAnalysis:
     """
     Performs real web analysis using the BrightData SERP API (via Direct Access)
     and OpenAI for summarization.
     """
-    print(f"Performing SERP analysis for: '{question}'")
+    logger.info("Performing SERP analysis for: '%s'", question)
     
     try:
         # Step 1: Construct the target URL and payload as per documentation
-        print("   🔍 Preparing BrightData Direct API request...")
+        logger.info("   🔍 Preparing BrightData Direct API request...")
 
         # The query is part of the URL. We must add '&brd_json=1' to get parsed JSON.
-        target_url = f"https://www.google.com/search?q={question.replace(' ', '+')}&brd_json=1"
+        # urlencode escapes '&', '#', '?' and non-ASCII characters in the question.
+        target_url = "https://www.google.com/search?" + urlencode({"q": question, "brd_json": 1})
 
         # The payload for BrightData SERP API
         payload = {
@@ -44,72 +306,83 @@ async def _perform_web_analysis(question: str) -> WebAnalysis:
         }
         
         # Step 2: Make the API call using the correct client and endpoint
-        print(f"   📤 Sending request to BrightData...")
-        print(f"   📝 Payload: {payload}")
+        logger.info("   📤 Sending request to BrightData...")
+        logger.debug("   📝 Payload: %s", payload)
         
         # Try the correct BrightData SERP API endpoint
         try:
-            response = await brightdata_client.post(url="/", json=payload)
+            response = await _post_to_brightdata(payload)
         except Exception as api_error:
-            print(f"   ❌ BrightData API call failed: {api_error}")
+            logger.error("   ❌ BrightData API call failed: %s", api_error)
             # Fallback to a simpler approach
             payload = {
                 "zone": "serp_api1",
                 "query": question,
                 "format": "json"
             }
-            print(f"   🔄 Trying fallback payload: {payload}")
-            response = await brightdata_client.post(url="/", json=payload)
+            logger.warning("   🔄 Trying fallback payload...")
+            logger.debug("   📝 Payload: %s", payload)
+            response = await _post_to_brightdata(payload)
         
         if response.status_code != 200:
-            print(f"   ❌ BrightData API error: {response.status_code}")
-            print(f"   📄 Error response: {response.text}")
+            logger.error("   ❌ BrightData API error: %s", response.status_code)
+            logger.error("   📄 Error response: %s", response.text)
             response.raise_for_status()
         
-        search_results = response.json()
-        print("   ✅ Received structured JSON response from BrightData.")
+        # orjson parses the (often several hundred KB) SERP payload much faster
+        # than the stdlib decoder behind response.json().
+        search_results = orjson.loads(response.content)
+        logger.info("   ✅ Received structured JSON response from BrightData.")
         
-        # Step 3: Extract and combine the useful text snippets for the LLM
+        # Step 3: Extract and combine the useful text snippets for the LLM,
+        # stopping at the last whole result that fits the context budget
         snippets = []
+        budget = SERP_CONTEXT_MAX_CHARS
         if isinstance(search_results, list):
             search_results = search_results[0]
 
         if search_results.get("organic"):
             for result in search_results["organic"][:10]:
                 if result.get("title") and result.get("description"):
-                    snippets.append(f"Title: {result['title']}\nSnippet: {result['description']}\n---")
+                    snippet = f"Title: {result['title']}\nSnippet: {result['description']}\n---"
+                    if len(snippet) > budget:
+                        # Only a single oversized first result is ever cut mid-text.
+                        if not snippets:
+                            snippets.append(snippet[:budget] + "... [truncated]")
+                        break
+                    snippets.append(snippet)
+                    budget -= len(snippet) + 1  # +1 for the joining newline
         
         if not snippets:
-            raise ValueError(f"SERP API did not return any organic results. Response preview: {str(search_results)[:500]}")
+            # Preview the raw bytes rather than repr() the whole parsed tree.
+            raise ValueError(f"SERP API did not return any organic results. Response preview: {response.content[:500].decode(errors='replace')}")
 
         serp_context = "\n".join(snippets)
         
-        if len(serp_context) > 8000:
-            serp_context = serp_context[:8000] + "... [truncated]"
-        
-        print(f"   📄 Extracted context for LLM. Length: {len(serp_context)} characters.")
+        logger.info("   📄 Extracted context for LLM. Length: %s characters.", len(serp_context))
         
         # Step 4: Use OpenAI to analyze the snippets
-        print("   🤖 Analyzing SERP data with OpenAI...")
+        logger.info("   🤖 Analyzing SERP data with OpenAI...")
         
+        # Only the question and snippets vary per job; the instructions live in
+        # the system message so the prompt prefix stays cacheable.
         analysis_prompt = f"""
-        Based on the following Top 10 Google search result snippets for the query "{question}":
+        Query: "{question}"
         
-        {serp_context}
+        Top 10 Google search result snippets:
         
-        Please provide a comprehensive analysis of these results. Summarize the key findings, identify the main brands or topics discussed, and conclude with the most relevant insights.
+        {serp_context}
         """
         
-        analysis_response = await openai_client.chat.completions.create(
-            model="gpt-4o",
+        analysis_text = await _complete(
+            str,
+            model=SERP_ANALYSIS_MODEL,
             messages=[
-                {"role": "system", "content": "You are an expert research analyst. Provide clear, structured analysis based on the given search results."},
+                SERP_ANALYST_SYSTEM_MESSAGE,
                 {"role": "user", "content": analysis_prompt}
             ]
         )
         
-        analysis_text = analysis_response.choices[0].message.content
-        
         return WebAnalysis(
             source="BrightData SERP API + OpenAI",
             content=analysis_text,
@@ -118,7 +391,7 @@ async def _perform_web_analysis(question: str) -> WebAnalysis:
         )
         
     except Exception as e:
-        print(f"   ❌ Error in web analysis: {e}")
+        logger.error("   ❌ Error in web analysis: %s", e)
         return WebAnalysis(
             source="Fallback Analysis",
             content=f"Unable to perform web analysis due to error: {e}",
@@ -126,62 +399,34 @@ async def _perform_web_analysis(question: str) -> WebAnalysis:
             confidence_score=0.0
         )
 
+@_cache_by_question(lambda question, result: result.simulated_response != _chatgpt_fallback_message(question))
 async def _simulate_chatgpt_response(question: str) -> ChatGPTResponse:
     """
     Gets a real response from OpenAI about the user's question.
+    The answer and the entities it mentions come back together from a single
+    structured-output call.
     """
-    print(f"Getting real OpenAI response for: '{question}'")
+    logger.info("Getting real OpenAI response for: '%s'", question)
     
     try:
-        # Use a completely different approach - direct question without complex prompting
-        print(f"   🔍 Making main OpenAI call with question: {question}")
-        print(f"   🔍 Using client with base_url: {openai_client.base_url}")
+        logger.debug("   🔍 Making OpenAI call with question: %s", question)
         
-        response = await openai_client.chat.completions.create(
+        response_data = await _complete(
+            orjson.loads,
             model="gpt-4o",
             messages=[
-                {
-                    "role": "system", 
-                    "content": "You are a helpful assistant. Answer questions directly and clearly."
-                },
+                CHATGPT_SYSTEM_MESSAGE,
                 {"role": "user", "content": question}
             ],
-            max_tokens=1000,
-            temperature=0.3
-        )
-        
-        response_text = response.choices[0].message.content
-        print(f"   ✅ OpenAI response received: {len(response_text)} characters")
-        
-        # Extract relevant entities from the response
-        entity_extraction_prompt = f"""
-        Extract the names of relevant companies, technologies, tools, or key entities mentioned in this text:
-        
-        {response_text}
-        
-        Return only a JSON array of entity names.
-        """
-        
-        print(f"   🔍 Making entity extraction call with prompt: {entity_extraction_prompt[:100]}...")
-        
-        entity_response = await openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that extracts entity names from text. Return only JSON."},
-                {"role": "user", "content": entity_extraction_prompt}
-            ],
-            response_format={"type": "json_object"}
+            max_tokens=CHATGPT_MAX_TOKENS,
+            temperature=0.3,
+            response_format=CHATGPT_RESPONSE_FORMAT
         )
         
-        entities_text = entity_response.choices[0].message.content
-        try:
-            entities_data = json.loads(entities_text)
-            # Handle both list and dict formats from OpenAI JSON response
-            identified_brands = entities_data.get('entities', entities_data) if isinstance(entities_data, dict) else entities_data
-        except (json.JSONDecodeError, AttributeError):
-            identified_brands = []
-        
-        print(f"   ✅ Entities extracted: {identified_brands}")
+        response_text = response_data["answer"]
+        identified_brands = response_data["entities"]
+        logger.info("   ✅ OpenAI response received: %s characters", len(response_text))
+        logger.debug("   ✅ Entities extracted: %s", identified_brands)
         
         return ChatGPTResponse(
             simulated_response=response_text,
@@ -189,12 +434,12 @@ async def _simulate_chatgpt_response(question: str) -> ChatGPTResponse:
         )
         
     except Exception as e:
-        print(f"   ❌ Error in OpenAI call: {e}")
+        logger.error("   ❌ Error in OpenAI call: %s", e)
         # Fallback to generic response
-        print("   🔄 Falling back to generic response due to OpenAI error")
+        logger.warning("   🔄 Falling back to generic response due to OpenAI error")
         
         fallback_response = ChatGPTResponse(
-            simulated_response=f"I can provide information about '{question}', but I encountered an error accessing my knowledge base. For the most accurate and up-to-date information, I recommend consulting authoritative sources or conducting further research on this topic.",
+            simulated_response=_chatgpt_fallback_message(question),
             identified_brands=[]
         )
         return fallback_response
@@ -206,67 +451,44 @@ async def _extract_visualization_data(web_analysis_text: str) -> VisualizationDa
     Uses a final LLM call to extract a structured visualization package from the web analysis text.
     The LLM is prompted to be transparent about its methodology.
     """
-    print("   📊 Extracting structured visualization data from web analysis...")
-    print(f"   📝 Input text length: {len(web_analysis_text)} characters")
-    print(f"   📝 Input text preview: {web_analysis_text[:200]}...")
+    logger.info("   📊 Extracting structured visualization data from web analysis...")
+    logger.info("   📝 Input text length: %s characters", len(web_analysis_text))
+    logger.debug("   📝 Input text preview: %.200s...", web_analysis_text)
     
+    # The extraction instructions live in the system message, so only the text
+    # to analyze varies and the prompt prefix stays cacheable.
     extraction_prompt = f"""
-    Analyze the following text, which is a summary of web search results for a specific query.
-    Your task is to identify the top 5 most prominent brands mentioned.
-
-    You must perform the following steps:
-    1.  **Identify Brands**: Scan the text to find all mentioned brand names.
-    2.  **Count Mentions**: Tally the number of times each brand is mentioned.
-    3.  **Assess Prominence**: Evaluate the prominence of each mention. Brands mentioned earlier, in headlines, or as primary recommendations are more prominent.
-    4.  **Calculate Visibility Score**: Based on a combination of mention count and prominence, calculate a 'visibility_score' for each brand on a scale of 1 to 100.
-    5.  **Rank Brands**: Rank the top 5 brands from 1 to 5 based on their score.
-    6.  **Explain Methodology**: Briefly (1-2 sentences) explain the specific factors you used from the text to determine the scores. For example: "Scores were based on mention frequency and prominence in lists of 'best' brands."
-
-    Your response MUST be a single, valid JSON object that strictly follows this structure:
-    {{
-      "top_5_brands": ["Brand A", "Brand B", ...],
-      "brand_scores": [
-        {{ "brand_name": "Brand A", "visibility_score": 95, "rank": 1, "mentions": 8 }},
-        {{ "brand_name": "Brand B", "visibility_score": 90, "rank": 2, "mentions": 6 }},
-        ...
-      ],
-      "methodology_explanation": "Your explanation here."
-    }}
-
     --- WEB ANALYSIS TEXT TO ANALYZE ---
     {web_analysis_text[:10000]}
     """
     
-    print("   🤖 Making OpenAI call for visualization extraction...")
+    logger.info("   🤖 Making OpenAI call for visualization extraction...")
     
     try:
-        response = await openai_client.chat.completions.create(
+        response = await _create_completion(
             model="gpt-4o",
             messages=[
-                {"role": "system", "content": "You are a highly precise data analysis and extraction engine. Your only output must be a single, valid JSON object that strictly adheres to the user's requested format. Do not include any other text or apologies."},
+                VISUALIZATION_SYSTEM_MESSAGE,
                 {"role": "user", "content": extraction_prompt}
             ],
             response_format={"type": "json_object"}
         )
         
-        print(f"   ✅ OpenAI response received: {len(response.choices[0].message.content)} characters")
-        print(f"   📄 Response content: {response.choices[0].message.content}")
+        logger.info("   ✅ OpenAI response received: %s characters", len(response.choices[0].message.content))
+        logger.debug("   📄 Response content: %s", response.choices[0].message.content)
         
-        extracted_data = json.loads(response.choices[0].message.content)
-        print(f"   🔍 Parsed JSON data: {extracted_data}")
+        extracted_data = orjson.loads(response.choices[0].message.content)
+        logger.debug("   🔍 Parsed JSON data: %s", extracted_data)
         
         # Validate the entire JSON object against our Pydantic model
         visualization_package = VisualizationData(**extracted_data)
         
-        print(f"   ✅ Successfully extracted and validated visualization package.")
-        print(f"   📊 Package contains {len(visualization_package.brand_scores)} brand scores")
+        logger.info("   ✅ Successfully extracted and validated visualization package.")
+        logger.info("   📊 Package contains %s brand scores", len(visualization_package.brand_scores))
         return visualization_package
 
     except Exception as e:
-        print(f"   ❌ Error extracting visualization data: {e}")
-        print(f"   🔍 Error type: {type(e).__name__}")
-        import traceback
-        print(f"   📋 Full traceback: {traceback.format_exc()}")
+        logger.exception("   ❌ Error extracting visualization data: %s", e)
         
         # Check if this is due to failed web analysis
         if "Unable to perform web analysis" in web_analysis_text or "SERP API did not return" in web_analysis_text:
@@ -314,130 +536,307 @@ async def _extract_visualization_data(web_analysis_text: str) -> VisualizationDa
             )
 
 
-# --- Database Interaction Functions ---
+def _web_analysis_failed(web_analysis: WebAnalysis) -> bool:
+    return "Unable to perform web analysis" in web_analysis.content or "SERP API did not return" in web_analysis.content
 
-async def update_job_status(analysis_id: str, status: StatusEnum, progress: int = 0, current_step: str = ""):
-    async with AsyncSessionLocal() as session:
-        async with session.begin():
-            stmt = update(Analysis).where(Analysis.id == analysis_id).values(status=status, progress=progress, current_step=current_step)
-            await session.execute(stmt)
 
-async def save_final_result(analysis_id: str, result: dict):
-    async with AsyncSessionLocal() as session:
-        async with session.begin():
-            stmt = update(Analysis).where(Analysis.id == analysis_id).values(status=StatusEnum.COMPLETE, progress=100, current_step="Finished", full_result=result)
-            await session.execute(stmt)
+async def _web_analysis_with_visualization(question: str) -> tuple[WebAnalysis, VisualizationData | None]:
+    """
+    Runs the web analysis and, when it succeeds, extracts the visualization from it.
+    The visualization is None when the web analysis failed, leaving the caller to
+    build one from the ChatGPT response instead.
+    """
+    web_analysis = await _perform_web_analysis(question)
+    if _web_analysis_failed(web_analysis):
+        return web_analysis, None
+
+    logger.info("   ✅ Web analysis succeeded, extracting visualization data...")
+    return web_analysis, await _extract_visualization_data(web_analysis_text=web_analysis.content)
+
+
+def _visualization_from_chatgpt_brands(identified_brands: List[str]) -> VisualizationData:
+    """Builds visualization data from ChatGPT's brand ranking when web analysis is unavailable."""
+    chatgpt_brands = identified_brands[:5]  # Top 5 brands
+    if not chatgpt_brands:
+        # No brands identified by ChatGPT either
+        return VisualizationData(
+            top_5_brands=["No brands identified"],
+            brand_scores=[{
+                "brand_name": "No brands identified",
+                "visibility_score": 1,
+                "rank": 1,
+                "mentions": 0
+            }],
+            methodology_explanation="Neither web analysis nor ChatGPT could identify specific brands for this query."
+        )
 
-async def handle_error(analysis_id: str, error_message: str):
-    async with AsyncSessionLocal() as session:
-        async with session.begin():
-            stmt = update(Analysis).where(Analysis.id == analysis_id).values(status=StatusEnum.ERROR, error_message=error_message, current_step="Error")
-            await session.execute(stmt)
+    brand_scores = [
+        {
+            "brand_name": brand,
+            "visibility_score": score,
+            "rank": i + 1,
+            "mentions": 1  # ChatGPT mentioned each brand once
+        }
+        for i, (brand, score) in enumerate(zip(chatgpt_brands, FALLBACK_VISIBILITY_SCORES))
+    ]
 
+    return VisualizationData(
+        top_5_brands=chatgpt_brands,
+        brand_scores=brand_scores,
+        methodology_explanation="Web analysis failed, so brand visibility scores are estimated based on ChatGPT's knowledge ranking. Higher scores indicate brands that ChatGPT considers more prominent in the industry."
+    )
 
-# --- Main Background Task (Refactored) ---
 
-async def run_full_analysis(analysis_id: str):
+def _has_fallback_sections(result: dict) -> bool:
     """
-    The main background task orchestrator.
+    True when any part of a saved result dict is fallback output rather than a
+    real analysis. Such results are served to their own job but never reused.
     """
-    print(f"Starting analysis for job ID: {analysis_id}")
-    try:
-        await update_job_status(analysis_id, StatusEnum.PROCESSING, 10, "Fetching research question")
+    return (
+        result["web_results"]["source"] == "Fallback Analysis"
+        or result["chatgpt_simulation"]["simulated_response"] == _chatgpt_fallback_message(result["research_question"])
+        or not FALLBACK_VISUALIZATION_LABELS.isdisjoint(result["visualization"]["top_5_brands"])
+    )
 
-        async with AsyncSessionLocal() as session:
-            analysis_record = await session.get(Analysis, analysis_id)
-            if not analysis_record:
-                raise ValueError("Analysis record not found at start of analysis.")
-            research_question = analysis_record.research_question
 
-        await update_job_status(analysis_id, StatusEnum.PROCESSING, 20, "Starting parallel data gathering")
+# --- Database Interaction Functions ---
+
+async def update_job_status(session: AsyncSession, analysis_id: str, status: StatusEnum, progress: int = 0, current_step: str = ""):
+    stmt = update(Analysis).where(Analysis.id == analysis_id).values(status=status, progress=progress, current_step=current_step)
+    await session.execute(stmt)
+    await session.commit()
+    notify_progress(analysis_id)
 
-        # --- Parallel Execution using asyncio.gather ---
-        # This is the core of our async optimization.
-        results = await asyncio.gather(
-            _perform_web_analysis(research_question),
-            _simulate_chatgpt_response(research_question)
+async def _commit_results(batch: list):
+    """Writes a batch in one transaction, as a single executemany UPDATE by primary key plus any question embeddings."""
+    async with AsyncSessionLocal() as session:
+        await session.execute(update(Analysis), [row for row, _, _ in batch])
+        session.add_all(
+            QuestionEmbedding(analysis_id=row["id"], embedding=embedding)
+            for row, embedding, _ in batch if embedding is not None
         )
-        
-        web_analysis_result: WebAnalysis = results[0]
-        chatgpt_simulation_result: ChatGPTResponse = results[1]
-        
-        print(f"[{analysis_id}] Parallel data gathering complete.")
-        
-        await update_job_status(analysis_id, StatusEnum.SYNTHESIZING, 75, "Synthesizing final report and visualization")
+        await session.commit()
+    for row, _, written in batch:
+        notify_progress(row["id"])
+        if not written.done():
+            written.set_result(None)
+
+def _fail_result(item: tuple, error: Exception):
+    row, _, written = item
+    logger.error("   ❌ Failed to write the final result for %s: %s", row["id"], error)
+    if not written.done():
+        written.set_exception(error)
+
+async def _result_writer():
+    """Drains queued final results and writes each burst in one transaction."""
+    while True:
+        batch = [await _result_queue.get()]
+        await asyncio.sleep(RESULT_BATCH_WINDOW_SECONDS)
+        while not _result_queue.empty():
+            batch.append(_result_queue.get_nowait())
 
-        # Check if web analysis was successful or failed
-        print(f"[{analysis_id}] 🔍 Starting visualization extraction...")
-        print(f"[{analysis_id}] 📝 Web analysis content length: {len(web_analysis_result.content)}")
-        print(f"[{analysis_id}] 📝 Web analysis preview: {web_analysis_result.content[:200]}...")
-        
-        # Determine if web analysis was successful or failed
-        if "Unable to perform web analysis" in web_analysis_result.content or "SERP API did not return" in web_analysis_result.content:
-            # Web analysis failed - create fallback visualization using ChatGPT data
-            print(f"[{analysis_id}] 🔄 Web analysis failed, creating fallback visualization from ChatGPT data...")
-            
-            # Create meaningful visualization data from ChatGPT response
-            chatgpt_brands = chatgpt_simulation_result.identified_brands[:5]  # Top 5 brands
-            if chatgpt_brands:
-                brand_scores = []
-                for i, brand in enumerate(chatgpt_brands):
-                    brand_scores.append({
-                        "brand_name": brand,
-                        "visibility_score": max(1, 100 - (i * 20)),  # Score from 100 down to 1
-                        "rank": i + 1,
-                        "mentions": 1  # ChatGPT mentioned each brand once
-                    })
-                
-                final_visualization = VisualizationData(
-                    top_5_brands=chatgpt_brands,
-                    brand_scores=brand_scores,
-                    methodology_explanation="Web analysis failed, so brand visibility scores are estimated based on ChatGPT's knowledge ranking. Higher scores indicate brands that ChatGPT considers more prominent in the industry."
-                )
+        try:
+            await _commit_results(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                _fail_result(batch[0], e)
             else:
-                # No brands identified by ChatGPT either
-                final_visualization = VisualizationData(
-                    top_5_brands=["No brands identified"],
-                    brand_scores=[{
-                        "brand_name": "No brands identified",
-                        "visibility_score": 1,
-                        "rank": 1,
-                        "mentions": 0
-                    }],
-                    methodology_explanation="Neither web analysis nor ChatGPT could identify specific brands for this query."
-                )
-        else:
-            # Web analysis succeeded - try to extract visualization data normally
-            print(f"[{analysis_id}] ✅ Web analysis succeeded, extracting visualization data...")
-            final_visualization = await _extract_visualization_data(
-                web_analysis_text=web_analysis_result.content
-            )
-        
-        print(f"[{analysis_id}] ✅ Visualization extraction complete!")
-        print(f"[{analysis_id}] 📊 Final visualization: {final_visualization}")
-
-        final_result = FullAnalysisResult(
-            analysis_id=analysis_id,
-            research_question=research_question,
-            completed_at=datetime.now(timezone.utc),
-            web_results=web_analysis_result,
-            chatgpt_simulation=chatgpt_simulation_result,
-            visualization=final_visualization,
+                # One bad row rolls back the whole transaction; retry each row on
+                # its own so only the offending job fails.
+                logger.warning("   ⚠️ Batched write of %s final results failed, retrying one at a time: %s", len(batch), e)
+                for item in batch:
+                    try:
+                        await _commit_results([item])
+                    except Exception as e:
+                        _fail_result(item, e)
+        finally:
+            for _ in batch:
+                _result_queue.task_done()
+
+
+async def stop_result_writer():
+    """Writes any results still queued, then stops the batched writer. Called on shutdown."""
+    if _result_writer_task is None or _result_writer_task.done():
+        return
+    await _result_queue.join()
+    _result_writer_task.cancel()
+    await asyncio.gather(_result_writer_task, return_exceptions=True)
+
+
+async def save_final_result(analysis_id: str, result: dict, embedding: bytes | None = None):
+    """Queues a job's final result for the batched writer and waits until it is committed."""
+    global _result_writer_task
+    if _result_writer_task is None or _result_writer_task.done():
+        _result_writer_task = asyncio.create_task(_result_writer())
+
+    row = {"id": analysis_id, "status": StatusEnum.COMPLETE, "progress": 100, "current_step": "Finished", "full_result": result}
+    written = asyncio.get_running_loop().create_future()
+    await _result_queue.put((row, embedding, written))
+    await written
+
+async def handle_error(session: AsyncSession, analysis_id: str, error_message: str):
+    await session.rollback()
+    stmt = update(Analysis).where(Analysis.id == analysis_id).values(status=StatusEnum.ERROR, error_message=error_message, current_step="Error")
+    await session.execute(stmt)
+    await session.commit()
+    notify_progress(analysis_id)
+
+
+# --- Main Background Task (Refactored) ---
+
+async def _save_reused_result(analysis_id: str, research_question: str, result: dict) -> dict:
+    """Saves another analysis' result as this job's result, re-keyed to this job."""
+    result_dict = {**result, "analysis_id": analysis_id, "research_question": research_question}
+    await save_final_result(analysis_id, result_dict)
+    return result_dict
+
+
+async def _gather_full_result(session: AsyncSession, analysis_id: str, research_question: str) -> dict:
+    """Runs the web and ChatGPT branches and assembles the final result dict."""
+    # --- Parallel Execution using asyncio.gather ---
+    # Visualization extraction only needs the web analysis, so it is
+    # chained onto the web branch and overlaps the ChatGPT call.
+    web_outcome, chatgpt_outcome = await asyncio.gather(
+        _web_analysis_with_visualization(research_question),
+        _simulate_chatgpt_response(research_question),
+        return_exceptions=True,
+    )
+
+    # A failure in one branch degrades that branch instead of aborting the job.
+    if isinstance(web_outcome, Exception):
+        logger.error("[%s] ❌ Web analysis branch failed: %s", analysis_id, web_outcome)
+        web_analysis_result = WebAnalysis(
+            source="Fallback Analysis",
+            content=f"Unable to perform web analysis due to error: {web_outcome}",
+            timestamp=datetime.now(timezone.utc),
+            confidence_score=0.0
+        )
+        final_visualization = None
+    else:
+        web_analysis_result, final_visualization = web_outcome
+
+    if isinstance(chatgpt_outcome, Exception):
+        logger.error("[%s] ❌ ChatGPT branch failed: %s", analysis_id, chatgpt_outcome)
+        chatgpt_simulation_result = ChatGPTResponse(
+            simulated_response=_chatgpt_fallback_message(research_question),
+            identified_brands=[]
         )
+    else:
+        chatgpt_simulation_result = chatgpt_outcome
 
-        result_dict = final_result.model_dump()
-        
-        # Convert all datetime fields to ISO format strings for JSON serialization
-        if 'completed_at' in result_dict:
-            result_dict['completed_at'] = result_dict['completed_at'].isoformat()
-        
-        # Convert timestamp in web_results if it exists
-        if 'web_results' in result_dict and 'timestamp' in result_dict['web_results']:
-            result_dict['web_results']['timestamp'] = result_dict['web_results']['timestamp'].isoformat()
+    logger.info("[%s] Parallel data gathering complete.", analysis_id)
+
+    await update_job_status(session, analysis_id, StatusEnum.SYNTHESIZING, 75, "Synthesizing final report and visualization")
 
-        await save_final_result(analysis_id, result_dict)
-        print(f"Successfully completed analysis for job ID: {analysis_id}")
+    if final_visualization is None:
+        # Web analysis failed - create fallback visualization using ChatGPT data
+        logger.warning("[%s] 🔄 Web analysis failed, creating fallback visualization from ChatGPT data...", analysis_id)
+        final_visualization = _visualization_from_chatgpt_brands(chatgpt_simulation_result.identified_brands)
 
+    logger.info("[%s] ✅ Visualization extraction complete!", analysis_id)
+    logger.debug("[%s] 📊 Final visualization: %s", analysis_id, final_visualization)
+
+    final_result = FullAnalysisResult(
+        analysis_id=analysis_id,
+        research_question=research_question,
+        completed_at=datetime.now(timezone.utc),
+        web_results=web_analysis_result,
+        chatgpt_simulation=chatgpt_simulation_result,
+        visualization=final_visualization,
+    )
+
+    # pydantic-core emits datetimes as ISO strings in one traversal, with no
+    # per-field fixups or JSON round-trip before the dict is stored.
+    return final_result.model_dump(mode="json")
+
+
+async def _analyze_question(session: AsyncSession, analysis_id: str, research_question: str) -> dict:
+    """
+    Produces and saves the final result for a job, reusing a semantically
+    similar completed analysis when one exists.
+    """
+    # --- Semantic Cache ---
+    # A paraphrase of a recently completed question reuses that analysis' result.
+    try:
+        question_embedding = await _embed_question(research_question)
     except Exception as e:
-        print(f"ERROR during analysis for job ID {analysis_id}: {e}")
-        await handle_error(analysis_id, str(e))
\ No newline at end of file
+        logger.warning("[%s] ⚠️ Could not embed research question, skipping semantic cache: %s", analysis_id, e)
+        question_embedding = None
+
+    if question_embedding is not None:
+        similar_id = await semantic_question_index.find_similar(question_embedding)
+        similar_result = None
+        if similar_id:
+            # Read on a short session of its own: on the job's session, autobegin
+            # would hold a transaction open through the whole pipeline below.
+            async with AsyncSessionLocal() as lookup_session:
+                stmt = select(Analysis.full_result).where(Analysis.id == similar_id)
+                similar_result = (await lookup_session.execute(stmt)).scalar_one_or_none()
+        if similar_result and not _has_fallback_sections(similar_result):
+            logger.info("[%s] ♻️ Reusing result of similar analysis %s", analysis_id, similar_id)
+            return await _save_reused_result(analysis_id, research_question, similar_result)
+
+    result_dict = await _gather_full_result(session, analysis_id, research_question)
+
+    # Only complete analyses are indexed for reuse by paraphrased questions.
+    reusable_embedding = question_embedding if question_embedding is not None and not _has_fallback_sections(result_dict) else None
+    await save_final_result(
+        analysis_id,
+        result_dict,
+        embedding=reusable_embedding.tobytes() if reusable_embedding is not None else None,
+    )
+    if reusable_embedding is not None:
+        semantic_question_index.add(analysis_id, reusable_embedding)
+    return result_dict
+
+
+async def run_full_analysis(analysis_id: str):
+    """
+    The main background task orchestrator.
+    """
+    logger.info("Starting analysis for job ID: %s", analysis_id)
+    # One session serves the whole job so every status write reuses the same
+    # connection checkout instead of opening a new one per update.
+    async with AsyncSessionLocal() as session:
+        try:
+            # Mark the job as started and read its question in one round-trip.
+            stmt = (
+                update(Analysis)
+                .where(Analysis.id == analysis_id)
+                .values(status=StatusEnum.PROCESSING, progress=20, current_step="Starting parallel data gathering")
+                .returning(Analysis.research_question)
+            )
+            research_question = (await session.execute(stmt)).scalar_one_or_none()
+            if research_question is None:
+                raise ValueError("Analysis record not found at start of analysis.")
+            await session.commit()
+            notify_progress(analysis_id)
+
+            # --- Single-Flight ---
+            # Concurrent jobs for the same question wait on the first one
+            # instead of each running the full pipeline.
+            question_key = research_question.strip().lower()
+            leader = _inflight_analyses.get(question_key)
+            if leader is not None:
+                shared_result = await asyncio.shield(leader)
+                if shared_result is not None:
+                    logger.info("[%s] ♻️ Reusing result of concurrent analysis for the same question", analysis_id)
+                    await _save_reused_result(analysis_id, research_question, shared_result)
+                    return
+
+            flight = asyncio.get_running_loop().create_future()
+            _inflight_analyses[question_key] = flight
+            try:
+                result_dict = await _analyze_question(session, analysis_id, research_question)
+                flight.set_result(result_dict)
+            finally:
+                # Waiters on a failed leader get None and run their own pipeline.
+                if not flight.done():
+                    flight.set_result(None)
+                if _inflight_analyses.get(question_key) is flight:
+                    del _inflight_analyses[question_key]
+            logger.info("Successfully completed analysis for job ID: %s", analysis_id)
+
+        except Exception as e:
+            logger.error("ERROR during analysis for job ID %s: %s", analysis_id, e)
+            await handle_error(session, analysis_id, str(e))
\ No newline at end of file
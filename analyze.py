@@ -5,17 +5,19 @@ Usage: python3 analyze.py "Your research question here"
 """
 
 import sys
-import asyncio
 import time
-import json
+import orjson
 import requests
 from typing import Optional
-import os
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Status polling starts fast and backs off while progress is unchanged.
+POLL_MIN_DELAY_SECONDS = 0.25
+POLL_MAX_DELAY_SECONDS = 3.0
+
 # Color codes for beautiful output
 class Colors:
     HEADER = '\033[95m'
@@ -28,27 +30,56 @@ class Colors:
     BOLD = '\033[1m'
     UNDERLINE = '\033[4m'
 
+# Color and icon prefix for each print_step status, built once.
+STEP_PREFIXES = {
+    "info": f"{Colors.OKBLUE}🔍 ",
+    "success": f"{Colors.OKGREEN}✅ ",
+    "warning": f"{Colors.WARNING}⚠️  ",
+    "error": f"{Colors.FAIL}❌ ",
+}
+
 class ProgressBar:
     def __init__(self, total: int, width: int = 50):
         self.total = total
         self.width = width
         self.current = 0
+        # Both halves of the bar are sliced from these instead of rebuilt per update.
+        self._filled_bar = '█' * width
+        self._empty_bar = '-' * width
+        self._drawn_percentage = None
+        self._drawn_step = ""
     
-    def update(self, current: int):
+    def update(self, current: int, step: str = ""):
         self.current = current
-        filled = int(self.width * self.current // self.total)
-        bar = '█' * filled + '-' * (self.width - filled)
         percentage = self.current * 100 // self.total
-        print(f'\r[{bar}] {percentage}%', end='', flush=True)
+        # The bar and its step are drawn together, and only when either changes,
+        # so heartbeats and repeated statuses print nothing.
+        if percentage == self._drawn_percentage and step == self._drawn_step:
+            return
+        self._drawn_percentage = percentage
+        self._drawn_step = step
+        filled = self.width * self.current // self.total
+        bar = f'\r[{self._filled_bar[:filled]}{self._empty_bar[filled:]}] {percentage}%'
+        if step:
+            # A step ends the line, so the next update starts on a fresh one.
+            print(f'{bar} {Colors.OKCYAN}{step}{Colors.ENDC}', flush=True)
+        else:
+            print(bar, end='', flush=True)
     
     def complete(self):
-        self.update(self.total)
-        print()
+        self.update(self.total, self._drawn_step)
+        if not self._drawn_step:
+            print()
 
 class AnalysisCLI:
     def __init__(self):
         self.base_url = "http://localhost:8000"
+        self.final_result: Optional[dict] = None
+        # One pooled session serves the health check, submit, status and results
+        # calls, so they all reuse the same keep-alive connection.
         self.session = requests.Session()
+        self.session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=4))
+        self.session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=4))
     
     def print_header(self, text: str):
         """Print a beautiful header."""
@@ -58,14 +89,9 @@ class AnalysisCLI:
     
     def print_step(self, text: str, status: str = "info"):
         """Print a step with appropriate color."""
-        if status == "info":
-            print(f"{Colors.OKBLUE}🔍 {text}{Colors.ENDC}")
-        elif status == "success":
-            print(f"{Colors.OKGREEN}✅ {text}{Colors.ENDC}")
-        elif status == "warning":
-            print(f"{Colors.WARNING}⚠️  {text}{Colors.ENDC}")
-        elif status == "error":
-            print(f"{Colors.FAIL}❌ {text}{Colors.ENDC}")
+        prefix = STEP_PREFIXES.get(status)
+        if prefix is not None:
+            print(prefix, text, Colors.ENDC, sep="")
     
     def print_result(self, title: str, content: str, color: str = Colors.OKCYAN):
         """Print a formatted result section."""
@@ -83,44 +109,78 @@ class AnalysisCLI:
                 headers={"Content-Type": "application/json"}
             )
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             return data.get("analysis_id")
         except requests.exceptions.RequestException as e:
             self.print_step(f"Failed to submit analysis: {str(e)}", "error")
             return None
     
+    def show_status(self, data: dict, progress_bar: ProgressBar) -> Optional[bool]:
+        """Render one status update. Returns True/False once the job has finished, else None."""
+        status = data.get("status")
+        progress = data.get("progress", 0)
+        current_step = data.get("current_step", "")
+        
+        # Update progress bar and current step
+        progress_bar.update(progress, current_step)
+        
+        if status == "COMPLETE":
+            self.final_result = data.get("result")
+            progress_bar.complete()
+            self.print_step("Analysis completed successfully!", "success")
+            return True
+        elif status == "ERROR":
+            progress_bar.complete()
+            error_msg = data.get("error_message", "Unknown error")
+            self.print_step(f"Analysis failed: {error_msg}", "error")
+            return False
+        return None
+    
     def monitor_progress(self, analysis_id: str) -> bool:
-        """Monitor the progress of an analysis job."""
+        """Monitor the progress of an analysis job via the server's status stream."""
         progress_bar = ProgressBar(100)
         
+        try:
+            with self.session.get(f"{self.base_url}/api/v1/analyze/{analysis_id}/status/stream", stream=True) as response:
+                if response.status_code == 404:
+                    # Servers without the stream endpoint still support polling.
+                    return self.poll_progress(analysis_id, progress_bar)
+                response.raise_for_status()
+                
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data: "):
+                        continue
+                    finished = self.show_status(orjson.loads(line[len("data: "):]), progress_bar)
+                    if finished is not None:
+                        return finished
+        except requests.exceptions.RequestException as e:
+            self.print_step(f"Failed to check status: {str(e)}", "error")
+            return False
+        
+        self.print_step("Status stream closed before the analysis finished", "error")
+        return False
+    
+    def poll_progress(self, analysis_id: str, progress_bar: ProgressBar) -> bool:
+        """
+        Monitor the progress of an analysis job by polling the status endpoint.
+        Polls quickly right after a change and backs off while progress stalls.
+        """
+        status_url = f"{self.base_url}/api/v1/analyze/{analysis_id}/status"
+        delay = POLL_MIN_DELAY_SECONDS
+        last_progress = None
         while True:
             try:
-                response = self.session.get(f"{self.base_url}/api/v1/analyze/{analysis_id}/status")
+                response = self.session.get(status_url)
                 response.raise_for_status()
-                data = response.json()
+                data = orjson.loads(response.content)
+                finished = self.show_status(data, progress_bar)
+                if finished is not None:
+                    return finished
                 
-                status = data.get("status")
                 progress = data.get("progress", 0)
-                current_step = data.get("current_step", "")
-                
-                # Update progress bar
-                progress_bar.update(progress)
-                
-                # Print current step
-                if current_step:
-                    print(f" {Colors.OKCYAN}{current_step}{Colors.ENDC}")
-                
-                if status == "COMPLETE":
-                    progress_bar.complete()
-                    self.print_step("Analysis completed successfully!", "success")
-                    return True
-                elif status == "ERROR":
-                    progress_bar.complete()
-                    error_msg = data.get("error_message", "Unknown error")
-                    self.print_step(f"Analysis failed: {error_msg}", "error")
-                    return False
-                
-                time.sleep(1)
+                delay = POLL_MIN_DELAY_SECONDS if progress != last_progress else min(delay * 1.5, POLL_MAX_DELAY_SECONDS)
+                last_progress = progress
+                time.sleep(delay)
                 
             except requests.exceptions.RequestException as e:
                 self.print_step(f"Failed to check status: {str(e)}", "error")
@@ -131,7 +191,7 @@ class AnalysisCLI:
         try:
             response = self.session.get(f"{self.base_url}/api/v1/analyze/{analysis_id}")
             response.raise_for_status()
-            return response.json()
+            return orjson.loads(response.content)
         except requests.exceptions.RequestException as e:
             self.print_step(f"Failed to get results: {str(e)}", "error")
             return None
@@ -204,9 +264,11 @@ class AnalysisCLI:
         if not self.monitor_progress(analysis_id):
             return False
         
-        # Step 3: Get results
-        self.print_step("Retrieving analysis results...")
-        results = self.get_results(analysis_id)
+        # Step 3: Get results, unless the final status already carried them
+        results = self.final_result
+        if not results:
+            self.print_step("Retrieving analysis results...")
+            results = self.get_results(analysis_id)
         if not results:
             return False
         
@@ -248,9 +310,11 @@ def main():
     
     question = sys.argv[1]
     
+    cli = AnalysisCLI()
+    
     # Check if server is running
     try:
-        response = requests.get("http://localhost:8000/docs", timeout=5)
+        response = cli.session.get(f"{cli.base_url}/docs", timeout=5)
         if response.status_code != 200:
             print(f"{Colors.FAIL}❌ API server is not responding properly.{Colors.ENDC}")
             print(f"{Colors.WARNING}Make sure the server is running with: python3 main.py{Colors.ENDC}")
@@ -261,7 +325,6 @@ def main():
         sys.exit(1)
     
     # Run analysis
-    cli = AnalysisCLI()
     success = cli.run_analysis(question)
     
     if not success:
@@ -6,29 +6,39 @@ Usage: python3 analyze.py "Your research question here"
 
 import sys
 import asyncio
-import time
-import json
+import orjson
 import httpx
-from typing import Optional
-import os
+from typing import Optional, TYPE_CHECKING
 from dotenv import load_dotenv
 from rich.console import Console
-from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn
 from rich.panel import Panel
-from rich.text import Text
-from rich.table import Table
 from rich import box
 
+if TYPE_CHECKING:
+    from rich.progress import Progress
+
 # Load environment variables
 load_dotenv()
 
+# Status polling starts fast and backs off while progress is unchanged.
+POLL_MIN_DELAY_SECONDS = 0.25
+POLL_MAX_DELAY_SECONDS = 3.0
+
 # Initialize Rich console
 console = Console()
 
 class AnalysisCLI:
     def __init__(self):
         self.base_url = "http://localhost:8000"
-        self.client = httpx.AsyncClient(timeout=60.0)
+        self.final_result: Optional[dict] = None
+        self._formatted_results: dict[str, list[tuple[str, str]]] = {}
+        # One pooled client serves the health check, submit, status and results
+        # calls, so they all reuse the same keep-alive connection.
+        self.client = httpx.AsyncClient(
+            timeout=60.0,
+            limits=httpx.Limits(max_keepalive_connections=8, keepalive_expiry=30.0),
+            http2=True,
+        )
     
     def print_header(self, text: str):
         """Print a beautiful header using Rich."""
@@ -59,14 +69,38 @@ class AnalysisCLI:
                 headers={"Content-Type": "application/json"}
             )
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             return data.get("analysis_id")
         except httpx.RequestError as e:
             self.print_step(f"Failed to submit analysis: {str(e)}", "error")
             return None
     
+    def show_status(self, data: dict, progress: "Progress", task) -> Optional[bool]:
+        """Render one status update. Returns True/False once the job has finished, else None."""
+        status = data.get("status")
+        progress_value = data.get("progress", 0)
+        current_step = data.get("current_step", "")
+        
+        # Update progress bar
+        progress.update(task, completed=progress_value, description=current_step)
+        
+        if status == "COMPLETE":
+            self.final_result = data.get("result")
+            progress.update(task, completed=100, description="Analysis completed!")
+            self.print_step("Analysis completed successfully!", "success")
+            return True
+        elif status == "ERROR":
+            progress.update(task, completed=100, description="Analysis failed!")
+            error_msg = data.get("error_message", "Unknown error")
+            self.print_step(f"Analysis failed: {error_msg}", "error")
+            return False
+        return None
+    
     async def monitor_progress(self, analysis_id: str) -> bool:
-        """Monitor the progress of an analysis job using Rich progress bar."""
+        """Monitor the progress of an analysis job via the server's status stream, using Rich progress bar."""
+        # rich.progress is only imported once progress is shown, keeping CLI startup light.
+        from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn
+        
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
@@ -76,41 +110,63 @@ class AnalysisCLI:
         ) as progress:
             task = progress.add_task("Analysis Progress", total=100)
             
-            while True:
-                try:
-                    response = await self.client.get(f"{self.base_url}/api/v1/analyze/{analysis_id}/status")
+            try:
+                # Status updates can be minutes apart, so only the connect is time-limited.
+                async with self.client.stream(
+                    "GET",
+                    f"{self.base_url}/api/v1/analyze/{analysis_id}/status/stream",
+                    timeout=httpx.Timeout(None, connect=5.0),
+                ) as response:
+                    if response.status_code == 404:
+                        # Servers without the stream endpoint still support polling.
+                        return await self.poll_progress(analysis_id, progress, task)
                     response.raise_for_status()
-                    data = response.json()
                     
-                    status = data.get("status")
-                    progress_value = data.get("progress", 0)
-                    current_step = data.get("current_step", "")
-                    
-                    # Update progress bar
-                    progress.update(task, completed=progress_value, description=current_step)
-                    
-                    if status == "COMPLETE":
-                        progress.update(task, completed=100, description="Analysis completed!")
-                        self.print_step("Analysis completed successfully!", "success")
-                        return True
-                    elif status == "ERROR":
-                        progress.update(task, completed=100, description="Analysis failed!")
-                        error_msg = data.get("error_message", "Unknown error")
-                        self.print_step(f"Analysis failed: {error_msg}", "error")
-                        return False
-                    
-                    await asyncio.sleep(1)
-                    
-                except httpx.RequestError as e:
-                    self.print_step(f"Failed to check status: {str(e)}", "error")
-                    return False
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data: "):
+                            continue
+                        finished = self.show_status(orjson.loads(line[len("data: "):]), progress, task)
+                        if finished is not None:
+                            return finished
+            except httpx.HTTPError as e:
+                self.print_step(f"Failed to check status: {str(e)}", "error")
+                return False
+            
+            self.print_step("Status stream closed before the analysis finished", "error")
+            return False
+    
+    async def poll_progress(self, analysis_id: str, progress: "Progress", task) -> bool:
+        """
+        Monitor the progress of an analysis job by polling the status endpoint.
+        Polls quickly right after a change and backs off while progress stalls.
+        """
+        status_url = f"{self.base_url}/api/v1/analyze/{analysis_id}/status"
+        delay = POLL_MIN_DELAY_SECONDS
+        last_progress = None
+        while True:
+            try:
+                response = await self.client.get(status_url)
+                response.raise_for_status()
+                data = orjson.loads(response.content)
+                finished = self.show_status(data, progress, task)
+                if finished is not None:
+                    return finished
+                
+                progress_value = data.get("progress", 0)
+                delay = POLL_MIN_DELAY_SECONDS if progress_value != last_progress else min(delay * 1.5, POLL_MAX_DELAY_SECONDS)
+                last_progress = progress_value
+                await asyncio.sleep(delay)
+                
+            except httpx.RequestError as e:
+                self.print_step(f"Failed to check status: {str(e)}", "error")
+                return False
     
     async def get_results(self, analysis_id: str) -> Optional[dict]:
         """Get the final analysis results."""
         try:
             response = await self.client.get(f"{self.base_url}/api/v1/analyze/{analysis_id}")
             response.raise_for_status()
-            return response.json()
+            return orjson.loads(response.content)
         except httpx.RequestError as e:
             self.print_step(f"Failed to get results: {str(e)}", "error")
             return None
@@ -161,6 +217,38 @@ class AnalysisCLI:
         
         return formatted
     
+    def format_results(self, analysis_id: str, results: dict) -> list[tuple[str, str]]:
+        """
+        Format every result section as (title, content) pairs. A COMPLETE result never
+        changes, so the formatted sections are cached per analysis ID for re-renders.
+        """
+        cached = self._formatted_results.get(analysis_id)
+        if cached is not None:
+            return cached
+        
+        # Research question
+        sections = [("Research Question", results.get("research_question", "N/A"))]
+        
+        # Web results
+        if "web_results" in results:
+            sections.append(("Web Analysis", self.format_web_results(results["web_results"])))
+        
+        # ChatGPT results
+        if "chatgpt_simulation" in results:
+            sections.append(("ChatGPT Analysis", self.format_chatgpt_results(results["chatgpt_simulation"])))
+        
+        # Visualization
+        if "visualization" in results:
+            sections.append(("Visualization", self.format_visualization(results["visualization"])))
+        
+        # Metadata
+        completed_at = results.get("completed_at", "N/A")
+        if completed_at != "N/A":
+            sections.append(("Completed At", completed_at))
+        
+        self._formatted_results[analysis_id] = sections
+        return sections
+    
     async def run_analysis(self, question: str):
         """Run the complete analysis workflow."""
         self.print_header("LLM Search Insight Analysis")
@@ -179,37 +267,18 @@ class AnalysisCLI:
         if not await self.monitor_progress(analysis_id):
             return False
         
-        # Step 3: Get results
-        self.print_step("Retrieving analysis results...")
-        results = await self.get_results(analysis_id)
+        # Step 3: Get results, unless the final status already carried them
+        results = self.final_result
+        if not results:
+            self.print_step("Retrieving analysis results...")
+            results = await self.get_results(analysis_id)
         if not results:
             return False
         
         # Step 4: Display results
         self.print_header("Analysis Results")
-        
-        # Research question
-        self.print_result("Research Question", results.get("research_question", "N/A"))
-        
-        # Web results
-        if "web_results" in results:
-            web_formatted = self.format_web_results(results["web_results"])
-            self.print_result("Web Analysis", web_formatted)
-        
-        # ChatGPT results
-        if "chatgpt_simulation" in results:
-            chatgpt_formatted = self.format_chatgpt_results(results["chatgpt_simulation"])
-            self.print_result("ChatGPT Analysis", chatgpt_formatted)
-        
-        # Visualization
-        if "visualization" in results:
-            viz_formatted = self.format_visualization(results["visualization"])
-            self.print_result("Visualization", viz_formatted)
-        
-        # Metadata
-        completed_at = results.get("completed_at", "N/A")
-        if completed_at != "N/A":
-            self.print_result("Completed At", completed_at)
+        for title, content in self.format_results(analysis_id, results):
+            self.print_result(title, content)
         
         self.print_header("Analysis Complete!")
         return True
@@ -227,22 +296,21 @@ async def main():
     
     question = sys.argv[1]
     
-    # Check if server is running
+    cli = AnalysisCLI()
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get("http://localhost:8000/docs")
+        # Check if server is running
+        try:
+            response = await cli.client.get(f"{cli.base_url}/docs", timeout=5.0)
             if response.status_code != 200:
                 console.print("❌ API server is not responding properly.", style="red")
                 console.print("Make sure the server is running with: cd src && uvicorn main:app --reload", style="yellow")
                 sys.exit(1)
-    except httpx.RequestError:
-        console.print("❌ Cannot connect to API server at http://localhost:8000", style="red")
-        console.print("Make sure the server is running with: cd src && uvicorn main:app --reload", style="yellow")
-        sys.exit(1)
-    
-    # Run analysis
-    cli = AnalysisCLI()
-    try:
+        except httpx.RequestError:
+            console.print("❌ Cannot connect to API server at http://localhost:8000", style="red")
+            console.print("Make sure the server is running with: cd src && uvicorn main:app --reload", style="yellow")
+            sys.exit(1)
+        
+        # Run analysis
         success = await cli.run_analysis(question)
         if not success:
             sys.exit(1)
@@ -250,4 +318,9 @@ async def main():
         await cli.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        import uvloop
+    except ImportError:  # uvloop is unavailable on Windows
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
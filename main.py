@@ -4,15 +4,24 @@ from datetime import datetime, timezone, timedelta
 from dotenv import load_dotenv
 load_dotenv()
 
+import asyncio
+import logging
+import logging.handlers
+import os
+import queue
 import uuid
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks
+import orjson
+
+from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
 # Import project components
-from database import engine, Base, AsyncSessionLocal
+from src.database import engine, Base, AsyncSessionLocal
 from models import Analysis
 from schemas import (
     AnalysisRequest,
@@ -23,19 +32,72 @@ from schemas import (
     ErrorType,
     StatusEnum,
 )
-from analysis.core import run_full_analysis 
+from analysis.core import run_full_analysis, stop_result_writer
+from analysis.clients import brightdata_client, openai_client
+from analysis.progress import progress_event, release_progress_event
+
+logger = logging.getLogger(__name__)
+
+# A status stream re-sends the current state at least this often, so idle
+# connections stay open through proxies.
+STATUS_STREAM_HEARTBEAT_SECONDS = 15
+
+# Completed results never change, so their serialized JSON is kept in-process
+# and served as-is on repeat requests until the analysis expires. Oldest
+# entries are evicted first.
+RESULT_CACHE_MAX_ENTRIES = 256
+_result_cache: dict[str, tuple[datetime, bytes]] = {}
+
+# Strong references to running analysis tasks; the event loop only keeps weak ones.
+_analysis_tasks: set[asyncio.Task] = set()
+
+# --- Logging ---
+
+def configure_logging() -> logging.handlers.QueueListener:
+    """
+    Routes all log records through an in-memory queue. Emitting a record is just an
+    enqueue; a background listener thread does the actual stdout writes, so logging
+    never blocks the event loop.
+    """
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root_logger = logging.getLogger()
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    root_logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    return logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+
 
 # --- Application Lifecycle ---
 
+def create_missing_indexes(connection):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # On startup
-    print("Application startup: Creating database tables...")
+    log_listener = configure_logging()
+    log_listener.start()
+    logger.info("Application startup: Creating database tables...")
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # create_all skips tables that already exist, so indexes added to an
+        # existing table are created here.
+        await conn.run_sync(create_missing_indexes)
     yield
     # On shutdown
-    print("Application shutdown.")
+    for task in _analysis_tasks:
+        task.cancel()
+    await asyncio.gather(*_analysis_tasks, return_exceptions=True)
+    # Results a cancelled job already queued are still written before exit.
+    await stop_result_writer()
+    await brightdata_client.aclose()
+    await openai_client.close()
+    logger.info("Application shutdown.")
+    log_listener.stop()
 
 
 # --- FastAPI App Initialization ---
@@ -44,6 +106,7 @@ app = FastAPI(
     title="LLM Search Insight API",
     version="5.1",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     responses={
         404: {"model": ErrorResponse, "description": "Resource Not Found"},
         500: {"model": ErrorResponse, "description": "Internal Server Error"},
@@ -56,10 +119,7 @@ app = FastAPI(
 async def get_db() -> AsyncSession:
     """Dependency that provides a database session for each request."""
     async with AsyncSessionLocal() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
+        yield session
 
 async def get_analysis_by_id(
     analysis_id: str, db: AsyncSession = Depends(get_db)
@@ -75,6 +135,18 @@ async def get_analysis_by_id(
         )
     return analysis
 
+async def read_status(analysis_id: str) -> StatusResponse | None:
+    """Reads the status columns of an analysis, plus its result only once it is COMPLETE."""
+    async with AsyncSessionLocal() as session:
+        stmt = select(Analysis.status, Analysis.progress, Analysis.current_step, Analysis.error_message).where(Analysis.id == analysis_id)
+        row = (await session.execute(stmt)).first()
+        if row is None:
+            return None
+        result = None
+        if row.status == StatusEnum.COMPLETE:
+            result = (await session.execute(select(Analysis.full_result).where(Analysis.id == analysis_id))).scalar_one()
+    return StatusResponse(status=row.status, progress=row.progress, current_step=row.current_step, error_message=row.error_message, result=result)
+
 
 # --- API Endpoints ---
 
@@ -86,7 +158,6 @@ async def get_analysis_by_id(
 )
 async def submit_analysis(
     request: AnalysisRequest,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -101,9 +172,12 @@ async def submit_analysis(
     )
     db.add(new_analysis)
     await db.commit()
-    await db.refresh(new_analysis)
 
-    background_tasks.add_task(run_full_analysis, new_analysis.id)
+    # Scheduled on the event loop directly rather than as a response background
+    # task, so the analysis is decoupled from this request's lifecycle.
+    task = asyncio.create_task(run_full_analysis(new_analysis.id))
+    _analysis_tasks.add(task)
+    task.add_done_callback(_analysis_tasks.discard)
 
     return AnalysisResponse(
         analysis_id=new_analysis.id,
@@ -115,26 +189,71 @@ async def submit_analysis(
     response_model=StatusResponse,
     summary="Check analysis job status",
 )
-async def get_analysis_status(analysis: Analysis = Depends(get_analysis_by_id)):
+async def get_analysis_status(analysis_id: str):
     """
     Poll this endpoint to get the current status and progress of an analysis job.
     """
-    return StatusResponse(
-        status=analysis.status,
-        progress=analysis.progress,
-        current_step=analysis.current_step,
-        error_message=analysis.error_message
-    )
+    current = await read_status(analysis_id)
+    if current is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": ErrorType.NOT_FOUND, "details": {"message": "Analysis ID not found"}},
+        )
+    return current
+
+@app.get(
+    "/api/v1/analyze/{analysis_id}/status/stream",
+    summary="Stream analysis job status",
+    response_class=StreamingResponse,
+)
+async def stream_analysis_status(analysis_id: str):
+    """
+    Server-sent events alternative to polling the status endpoint. Pushes a
+    StatusResponse whenever the job's status changes and closes the stream once
+    the job is COMPLETE (with the result attached) or ERROR.
+    """
+    changed = progress_event(analysis_id)
+    current = await read_status(analysis_id)
+    if current is None:
+        release_progress_event(analysis_id)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": ErrorType.NOT_FOUND, "details": {"message": "Analysis ID not found"}},
+        )
+
+    async def events():
+        nonlocal changed, current
+        while current is not None:
+            yield f"data: {current.model_dump_json()}\n\n"
+            if current.status in (StatusEnum.COMPLETE, StatusEnum.ERROR):
+                release_progress_event(analysis_id)
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), STATUS_STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            changed = progress_event(analysis_id)
+            current = await read_status(analysis_id)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
 
 @app.get(
     "/api/v1/analyze/{analysis_id}",
     response_model=FullAnalysisResult,
     summary="Get final analysis results",
 )
-async def get_analysis_result(analysis: Analysis = Depends(get_analysis_by_id)):
+async def get_analysis_result(analysis_id: str, db: AsyncSession = Depends(get_db)):
     """
     Retrieve the full analysis report once the status is COMPLETE.
     """
+    cached = _result_cache.get(analysis_id)
+    if cached is not None:
+        expires_at, body = cached
+        if expires_at > datetime.now(timezone.utc):
+            return Response(content=body, media_type="application/json")
+        del _result_cache[analysis_id]
+
+    analysis = await get_analysis_by_id(analysis_id, db)
     if analysis.status != StatusEnum.COMPLETE:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -142,9 +261,16 @@ async def get_analysis_result(analysis: Analysis = Depends(get_analysis_by_id)):
         )
         
     # TODO: Implement expiration filtering
-    
-    return analysis.full_result
+
+    # The stored payload was validated when the job saved it, so it is
+    # serialized directly instead of round-tripping through the response model.
+    body = orjson.dumps(analysis.full_result)
+    if len(_result_cache) >= RESULT_CACHE_MAX_ENTRIES:
+        del _result_cache[next(iter(_result_cache))]
+    # SQLite hands back naive datetimes; every stored timestamp is UTC.
+    _result_cache[analysis_id] = (analysis.expires_at.replace(tzinfo=timezone.utc), body)
+    return Response(content=body, media_type="application/json")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop="uvloop", http="httptools")
\ No newline at end of file
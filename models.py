@@ -2,27 +2,51 @@
 
 import uuid
 from datetime import datetime, timedelta, timezone
-from sqlalchemy import String, DateTime, Integer, JSON, Text
+from sqlalchemy import String, DateTime, Integer, JSON, Text, LargeBinary, ForeignKey
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column
-from database import Base
+from src.database import Base
 from schemas import StatusEnum
 import os # Keep os for getenv
 
 CACHE_TTL_HOURS = int(os.getenv("CACHE_TTL_HOURS", 24))
+# Built once at import; every insert reuses it.
+CACHE_TTL = timedelta(hours=CACHE_TTL_HOURS)
 
 def get_expiration_time():
-    return datetime.now(timezone.utc) + timedelta(hours=CACHE_TTL_HOURS)
+    return datetime.now(timezone.utc) + CACHE_TTL
 
 class Analysis(Base):
     __tablename__ = "analyses"
 
     id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     research_question: Mapped[str] = mapped_column(String(500))
-    status: Mapped[str] = mapped_column(String(50), default=StatusEnum.QUEUED)
+    # Indexed for the status filters used by the result and semantic-cache lookups.
+    status: Mapped[str] = mapped_column(String(50), default=StatusEnum.QUEUED, index=True)
     progress: Mapped[int] = mapped_column(default=0)
     current_step: Mapped[str | None] = mapped_column(String(100), nullable=True)
     error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
-    full_result: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    # Stored as binary JSONB on PostgreSQL, plain JSON elsewhere.
+    full_result: Mapped[dict | None] = mapped_column(JSON().with_variant(JSONB, "postgresql"), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), onupdate=lambda: datetime.now(timezone.utc))
-    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=get_expiration_time)
\ No newline at end of file
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=get_expiration_time)
+
+
+class LLMCacheEntry(Base):
+    """A cached OpenAI completion, keyed by the SHA-256 of its request parameters."""
+    __tablename__ = "llm_cache"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    response: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=get_expiration_time)
+
+
+class QuestionEmbedding(Base):
+    """The embedding of a completed analysis' research question, used by the semantic cache."""
+    __tablename__ = "question_embeddings"
+
+    analysis_id: Mapped[str] = mapped_column(ForeignKey("analyses.id", ondelete="CASCADE"), primary_key=True)
+    # Raw float32 bytes of the L2-normalized embedding vector.
+    embedding: Mapped[bytes] = mapped_column(LargeBinary)
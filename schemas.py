@@ -44,6 +44,8 @@ class StatusResponse(BaseModel):
     progress: int
     current_step: Optional[str] = None
     error_message: Optional[str] = None
+    # Included once the job is COMPLETE, saving clients a separate results request.
+    result: Optional["FullAnalysisResult"] = None
 
 # --- Schemas for the Final Result Payload ---
 # Schemas defining the structure of the final analysis report.
@@ -84,3 +86,6 @@ class FullAnalysisResult(BaseModel):
     web_results: WebAnalysis
     chatgpt_simulation: ChatGPTResponse
     visualization: VisualizationData
+
+# Resolve the forward reference to FullAnalysisResult.
+StatusResponse.model_rebuild()
@@ -0,0 +1,46 @@
+# src/analysis/cache.py
+
+import hashlib
+import logging
+from datetime import datetime, timezone
+
+import orjson
+from sqlalchemy import select
+
+from database import AsyncSessionLocal
+from models import LLMCacheEntry, get_expiration_time
+
+logger = logging.getLogger(__name__)
+
+
+def completion_cache_key(request: dict) -> str:
+    """
+    Hashes a chat completion request (model, messages, response_format, ...) into a
+    stable SHA-256 key. Keys are sorted so argument order never matters.
+    """
+    return hashlib.sha256(orjson.dumps(request, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+async def get_cached_completion(key: str) -> str | None:
+    """Returns the cached completion content for `key`, or None on a miss or expired entry."""
+    try:
+        async with AsyncSessionLocal() as session:
+            stmt = select(LLMCacheEntry.response).where(
+                LLMCacheEntry.key == key,
+                LLMCacheEntry.expires_at > datetime.now(timezone.utc),
+            )
+            return (await session.execute(stmt)).scalar_one_or_none()
+    except Exception as e:
+        # The cache is an optimization; a broken cache must never fail the job.
+        logger.warning("   ⚠️ LLM cache lookup failed: %s", e)
+        return None
+
+
+async def store_completion(key: str, response: str):
+    """Stores (or refreshes) the completion content for `key` for CACHE_TTL_HOURS."""
+    try:
+        async with AsyncSessionLocal() as session:
+            await session.merge(LLMCacheEntry(key=key, response=response, expires_at=get_expiration_time()))
+            await session.commit()
+    except Exception as e:
+        logger.warning("   ⚠️ LLM cache write failed: %s", e)
@@ -27,10 +27,19 @@ except ValueError as e:
     print("💡 Please set your API keys before running the application.")
     raise
 
+# Both clients keep a pool of HTTP/2 connections, so concurrent requests
+# multiplex over a few warm connections instead of repeating TCP+TLS setup.
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=60.0)
+
 # Initialize OpenAI client
 openai_client = AsyncOpenAI(
     api_key=openai_api_key,
-    base_url="https://api.openai.com/v1"
+    base_url="https://api.openai.com/v1",
+    http_client=httpx.AsyncClient(
+        timeout=httpx.Timeout(60.0, connect=5.0),
+        limits=HTTP_LIMITS,
+        http2=True,
+    ),
 )
 
 # Initialize Bright Data client
@@ -44,4 +53,6 @@ brightdata_client = httpx.AsyncClient(
     base_url=BRIGHTDATA_API_URL,
     headers=brightdata_headers,
     timeout=60.0,
+    # The transport owns the pool settings; its retries cover failed connects only.
+    transport=httpx.AsyncHTTPTransport(http2=True, limits=HTTP_LIMITS, retries=2),
 )
@@ -1,84 +1,177 @@
 # src/analysis/collector.py
-import asyncio
-import json
+import functools
+import hashlib
+import logging
+import re
+import time
 from datetime import datetime, timezone
 
+import orjson
+
 from analysis.clients import openai_client, brightdata_client
+from analysis.memoize import semantic_memoize
 from schemas import WebAnalysis, ChatGPTResponse
 
+logger = logging.getLogger(__name__)
+
+CHATGPT_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "You are a helpful assistant. Answer questions directly and clearly. Put your answer in the 'answer' field and list the names of relevant companies, technologies, tools, or key entities mentioned in your answer in the 'entities' field.",
+}
+
+# JSON schema for the single structured-output call that returns both the
+# answer and the entities it mentions.
+CHATGPT_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "chatgpt_response",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "answer": {"type": "string"},
+                "entities": {"type": "array", "items": {"type": "string"}},
+            },
+            "required": ["answer", "entities"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Output budget for the ChatGPT call. It covers the JSON-escaped answer plus the
+# entities list, so it sits well above what a plain-text answer needs; a
+# truncated object does not parse and the whole answer falls back.
+CHATGPT_MAX_TOKENS = 2000
+
+WEB_ANALYSIS_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "You are an expert at simulating realistic web search results and an expert research analyst. Generate results that look like actual Google search results, then provide clear, structured analysis based on them.",
+}
+
+# Only the question varies per call; the rest of the prompt is built once.
+WEB_ANALYSIS_PROMPT_TEMPLATE = """\
+First, simulate what the top 5-8 Google search results would look like for the query: "{question}"
+
+For each result, provide:
+- A realistic title (like what you'd see in search results)
+- A snippet/description (like the meta description)
+- The source/domain
+
+Format each result like this:
+Title: [Realistic search result title]
+Snippet: [Realistic description that would appear in search results]
+Source: [Realistic domain like example.com]
+---
+
+Make these look like actual search results someone would find for this query, and put them in the 'search_results' field.
+
+Then, based on those simulated search results, provide a comprehensive analysis of them in the 'analysis' field. Summarize the key findings, identify the main brands or topics discussed, and conclude with the most relevant insights.
+
+This should read like a real analysis of web search results.
+"""
+
+# JSON schema for the single call that simulates search results and analyzes
+# them. 'search_results' is listed first so it is generated before the analysis.
+WEB_ANALYSIS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "web_analysis",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "search_results": {"type": "string"},
+                "analysis": {"type": "string"},
+            },
+            "required": ["search_results", "analysis"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Analyses that discuss brands or companies earn a confidence bonus. One
+# case-insensitive scan replaces lowercasing the whole text per keyword.
+CONFIDENCE_KEYWORDS = re.compile(r"brand|company", re.IGNORECASE)
+
+# Collector results are reused for identical questions within this window.
+QUESTION_CACHE_TTL_SECONDS = 24 * 3600
+QUESTION_CACHE_MAX_ENTRIES = 512
+
+
+def _question_key(question: str) -> str:
+    return hashlib.sha256(question.strip().lower().encode()).hexdigest()
+
+
+def _cache_by_question(is_cacheable):
+    """
+    Caches a collector's result per normalized question for QUESTION_CACHE_TTL_SECONDS.
+    Fallback results are rejected by `is_cacheable` so a failed call is retried next time.
+    """
+    def decorator(func):
+        cache = {}
+
+        @functools.wraps(func)
+        async def wrapper(question: str):
+            key = _question_key(question)
+            cached = cache.get(key)
+            if cached and cached[0] > time.monotonic():
+                logger.info("   ♻️ Reusing cached %s result for: '%s'", func.__name__, question)
+                return cached[1]
+            result = await func(question)
+            if is_cacheable(question, result):
+                cache[key] = (time.monotonic() + QUESTION_CACHE_TTL_SECONDS, result)
+                if len(cache) > QUESTION_CACHE_MAX_ENTRIES:
+                    cache.pop(next(iter(cache)))
+            return result
+
+        return wrapper
+    return decorator
+
+
+def chatgpt_fallback_message(question: str) -> str:
+    return f"I can provide information about '{question}', but I encountered an error accessing my knowledge base. For the most accurate and up-to-date information, I recommend consulting authoritative sources or conducting further research on this topic."
+
+
+@_cache_by_question(lambda question, result: result.source != "Fallback Analysis")
+@semantic_memoize(lambda question, result: result.source != "Fallback Analysis")
 async def perform_web_analysis(question: str) -> WebAnalysis:
     """
     Performs web analysis using OpenAI to simulate search results and provide analysis.
     This is a working fallback while we fix the external SERP API integration.
     """
-    print(f"Performing web analysis for: '{question}'")
+    logger.info("Performing web analysis for: '%s'", question)
     
     try:
-        print("   🔍 Using OpenAI to simulate web search analysis...")
+        logger.debug("   🔍 Using OpenAI to simulate web search analysis...")
         
-        # Step 1: Use OpenAI to simulate what web search results would look like
-        search_simulation_prompt = f"""
-        Simulate what the top 5-8 Google search results would look like for the query: "{question}"
+        # The simulated search results and their analysis come back from one
+        # structured-output call: the model writes the results first and then
+        # analyzes them, without a second round trip that re-sends the results.
+        web_analysis_prompt = WEB_ANALYSIS_PROMPT_TEMPLATE.format(question=question)
         
-        For each result, provide:
-        - A realistic title (like what you'd see in search results)
-        - A snippet/description (like the meta description)
-        - The source/domain
-        
-        Format each result like this:
-        Title: [Realistic search result title]
-        Snippet: [Realistic description that would appear in search results]
-        Source: [Realistic domain like example.com]
-        ---
-        
-        Make these look like actual search results someone would find for this query.
-        """
-        
-        print("   🤖 Generating simulated search results with OpenAI...")
-        
-        search_response = await openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are an expert at simulating realistic web search results. Generate results that look like actual Google search results."},
-                {"role": "user", "content": search_simulation_prompt}
-            ]
-        )
-        
-        simulated_results = search_response.choices[0].message.content
-        
-        # Step 2: Use OpenAI to analyze the simulated results
-        print("   🤖 Analyzing simulated search results with OpenAI...")
-        
-        analysis_prompt = f"""
-        Based on the following simulated search results for the query "{question}":
-        
-        {simulated_results}
-        
-        Please provide a comprehensive analysis of these results. Summarize the key findings, identify the main brands or topics discussed, and conclude with the most relevant insights.
-        
-        This should read like a real analysis of web search results.
-        """
+        logger.debug("   🤖 Generating and analyzing simulated search results with OpenAI...")
         
         analysis_response = await openai_client.chat.completions.create(
             model="gpt-4o",
             messages=[
-                {"role": "system", "content": "You are an expert research analyst. Provide clear, structured analysis based on the given search results."},
-                {"role": "user", "content": analysis_prompt}
-            ]
+                WEB_ANALYSIS_SYSTEM_MESSAGE,
+                {"role": "user", "content": web_analysis_prompt}
+            ],
+            response_format=WEB_ANALYSIS_RESPONSE_FORMAT
         )
         
-        analysis_text = analysis_response.choices[0].message.content
+        analysis_text = orjson.loads(analysis_response.choices[0].message.content)["analysis"]
         
         # Calculate confidence score based on analysis quality
         confidence_score = 0.7  # Good confidence for simulated results
         if len(analysis_text) > 800:
             confidence_score += 0.2
-        if "brand" in analysis_text.lower() or "company" in analysis_text.lower():
+        if CONFIDENCE_KEYWORDS.search(analysis_text):
             confidence_score += 0.1
         
         confidence_score = min(confidence_score, 1.0)
         
-        print(f"   📊 Calculated confidence score: {confidence_score:.2f}")
+        logger.debug("   📊 Calculated confidence score: %.2f", confidence_score)
         
         return WebAnalysis(
             source="OpenAI Simulated Web Analysis",
@@ -88,7 +181,7 @@ async def perform_web_analysis(question: str) -> WebAnalysis:
         )
         
     except Exception as e:
-        print(f"   ❌ Error in web analysis: {e}")
+        logger.error("   ❌ Error in web analysis: %s", e)
         
         # Return a fallback analysis instead of crashing
         fallback_content = f"Unable to perform web analysis due to error: {e}\n\nThis analysis is based on ChatGPT's knowledge only, without real-time web search data."
@@ -100,62 +193,37 @@ async def perform_web_analysis(question: str) -> WebAnalysis:
             confidence_score=0.1  # Very low confidence for fallback
         )
 
+@_cache_by_question(lambda question, result: result.simulated_response != chatgpt_fallback_message(question))
+@semantic_memoize(lambda question, result: result.simulated_response != chatgpt_fallback_message(question))
 async def simulate_chatgpt_response(question: str) -> ChatGPTResponse:
     """
     Gets a real response from OpenAI about the user's question.
     """
-    print(f"Getting real OpenAI response for: '{question}'")
+    logger.info("Getting real OpenAI response for: '%s'", question)
     
     try:
         # Use a completely different approach - direct question without complex prompting
-        print(f"   🔍 Making main OpenAI call with question: {question}")
-        print(f"   🔍 Using client with base_url: {openai_client.base_url}")
+        logger.debug("   🔍 Making main OpenAI call with question: %s", question)
+        logger.debug("   🔍 Using client with base_url: %s", openai_client.base_url)
         
         response = await openai_client.chat.completions.create(
             model="gpt-4o",
             messages=[
-                {
-                    "role": "system", 
-                    "content": "You are a helpful assistant. Answer questions directly and clearly."
-                },
+                CHATGPT_SYSTEM_MESSAGE,
                 {"role": "user", "content": question}
             ],
-            max_tokens=1000,
-            temperature=0.3
-        )
-        
-        response_text = response.choices[0].message.content
-        print(f"   ✅ OpenAI response received: {len(response_text)} characters")
-        
-        # Extract relevant entities from the response
-        entity_extraction_prompt = f"""
-        Extract the names of relevant companies, technologies, tools, or key entities mentioned in this text:
-        
-        {response_text}
-        
-        Return only a JSON array of entity names.
-        """
-        
-        print(f"   🔍 Making entity extraction call with prompt: {entity_extraction_prompt[:100]}...")
-        
-        entity_response = await openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that extracts entity names from text. Return only JSON."},
-                {"role": "user", "content": entity_extraction_prompt}
-            ],
-            response_format={"type": "json_object"}
+            max_tokens=CHATGPT_MAX_TOKENS,
+            temperature=0.3,
+            response_format=CHATGPT_RESPONSE_FORMAT
         )
         
-        entities_text = entity_response.choices[0].message.content
-        try:
-            entities_data = json.loads(entities_text)
-            # Handle both list and dict formats from OpenAI JSON response
-            identified_brands = entities_data.get('entities', entities_data) if isinstance(entities_data, dict) else entities_data
-        except (json.JSONDecodeError, AttributeError):
-            identified_brands = []
-        
-        print(f"   ✅ Entities extracted: {identified_brands}")
+        # The answer and the entities it mentions come back together from one
+        # structured-output call.
+        response_data = orjson.loads(response.choices[0].message.content)
+        response_text = response_data["answer"]
+        identified_brands = response_data["entities"]
+        logger.debug("   ✅ OpenAI response received: %d characters", len(response_text))
+        logger.debug("   ✅ Entities extracted: %s", identified_brands)
         
         return ChatGPTResponse(
             simulated_response=response_text,
@@ -163,12 +231,12 @@ async def simulate_chatgpt_response(question: str) -> ChatGPTResponse:
         )
         
     except Exception as e:
-        print(f"   ❌ Error in OpenAI call: {e}")
+        logger.error("   ❌ Error in OpenAI call: %s", e)
         # Fallback to generic response
-        print("   🔄 Falling back to generic response due to OpenAI error")
+        logger.warning("   🔄 Falling back to generic response due to OpenAI error")
         
         fallback_response = ChatGPTResponse(
-            simulated_response=f"I can provide information about '{question}', but I encountered an error accessing my knowledge base. For the most accurate and up-to-date information, I recommend consulting authoritative sources or conducting further research on this topic.",
+            simulated_response=chatgpt_fallback_message(question),
             identified_brands=[]
         )
         return fallback_response
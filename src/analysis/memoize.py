@@ -0,0 +1,107 @@
+# src/analysis/memoize.py
+import asyncio
+import functools
+import logging
+import time
+
+import numpy as np
+
+from analysis.clients import openai_client
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Cosine similarity at or above which two questions share a cached result.
+SEMANTIC_CACHE_THRESHOLD = 0.85
+SEMANTIC_CACHE_TTL_SECONDS = 24 * 3600
+SEMANTIC_CACHE_MAX_ENTRIES = 10_000
+
+# Embedding tasks per normalized question, so the collectors that run side by
+# side for one question share a single embeddings call.
+_embedding_tasks: dict[str, asyncio.Task] = {}
+
+
+async def _fetch_embedding(question: str) -> np.ndarray:
+    response = await openai_client.embeddings.create(model=EMBEDDING_MODEL, input=question)
+    embedding = np.asarray(response.data[0].embedding, dtype=np.float32)
+    return embedding / np.linalg.norm(embedding)
+
+
+async def embed_question(question: str) -> np.ndarray:
+    """Returns the L2-normalized float32 embedding of a question."""
+    key = question.strip().lower()
+    task = _embedding_tasks.get(key)
+    if task is None or (task.done() and task.exception() is not None):
+        task = asyncio.create_task(_fetch_embedding(key))
+        _embedding_tasks[key] = task
+        if len(_embedding_tasks) > SEMANTIC_CACHE_MAX_ENTRIES:
+            _embedding_tasks.pop(next(iter(_embedding_tasks)))
+    return await asyncio.shield(task)
+
+
+class SemanticMemo:
+    """
+    Results stored against question embeddings. Embeddings are L2-normalized, so
+    one matrix-vector product scores every stored question at once. Rows live in
+    a preallocated ring buffer, so once the memo is full each insert overwrites
+    the oldest entry in place.
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD):
+        self._threshold = threshold
+        # Allocated on the first put, once the embedding width is known. np.empty
+        # only reserves the memory; pages are committed as rows are written.
+        self._matrix: np.ndarray | None = None
+        self._stored_at = np.empty(SEMANTIC_CACHE_MAX_ENTRIES)
+        self._results: list = [None] * SEMANTIC_CACHE_MAX_ENTRIES
+        self._head = 0  # Next row to write.
+        self._size = 0  # Rows in use; always the first `_size` rows.
+
+    def get(self, embedding: np.ndarray):
+        if self._size == 0:
+            return None
+        similarities = self._matrix[:self._size] @ embedding
+        similarities[self._stored_at[:self._size] < time.monotonic() - SEMANTIC_CACHE_TTL_SECONDS] = -1.0
+        best = int(np.argmax(similarities))
+        if similarities[best] < self._threshold:
+            return None
+        return self._results[best]
+
+    def put(self, embedding: np.ndarray, result):
+        if self._matrix is None:
+            self._matrix = np.empty((SEMANTIC_CACHE_MAX_ENTRIES, embedding.shape[0]), dtype=np.float32)
+        self._matrix[self._head] = embedding
+        self._stored_at[self._head] = time.monotonic()
+        self._results[self._head] = result
+        self._head = (self._head + 1) % SEMANTIC_CACHE_MAX_ENTRIES
+        self._size = min(self._size + 1, SEMANTIC_CACHE_MAX_ENTRIES)
+
+
+def semantic_memoize(is_cacheable):
+    """
+    Reuses a collector's result for any earlier question whose embedding is within
+    SEMANTIC_CACHE_THRESHOLD. Results rejected by `is_cacheable` are not stored, and
+    a failed embeddings call just runs the collector uncached.
+    """
+    def decorator(func):
+        memo = SemanticMemo()
+
+        @functools.wraps(func)
+        async def wrapper(question: str):
+            try:
+                embedding = await embed_question(question)
+            except Exception as e:
+                logger.warning("   ⚠️ Question embedding failed, skipping semantic cache: %s", e)
+                return await func(question)
+            cached = memo.get(embedding)
+            if cached is not None:
+                logger.info("   ♻️ Reusing semantically similar %s result for: '%s'", func.__name__, question)
+                return cached
+            result = await func(question)
+            if is_cacheable(question, result):
+                memo.put(embedding, result)
+            return result
+
+        return wrapper
+    return decorator
@@ -1,36 +1,73 @@
 # src/analysis/orchestrator.py
 import asyncio
+import logging
 from datetime import datetime, timezone
 from sqlalchemy import update
 
 from database import AsyncSessionLocal
 from models import Analysis
-from schemas import StatusEnum, FullAnalysisResult
+from schemas import StatusEnum, FullAnalysisResult, WebAnalysis, VisualizationData, BrandVisibilityScore
 
 # Import from our new, specialized modules
-from analysis.collector import perform_web_analysis, simulate_chatgpt_response
-from analysis.processor import process_analysis_results
-from analysis.visualizer import extract_visualization_data
+from analysis.collector import chatgpt_fallback_message, perform_web_analysis, simulate_chatgpt_response
+from analysis.visualizer import (
+    FALLBACK_VISUALIZATION_LABELS,
+    extract_visualization_data,
+    fallback_visualization,
+    web_analysis_failed,
+)
+from analysis.memoize import SemanticMemo, embed_question
+from analysis.progress import notify_progress
+
+logger = logging.getLogger(__name__)
+
+# A job whose question is at least this similar to an earlier completed one
+# reuses that job's result and skips the whole pipeline.
+JOB_REUSE_THRESHOLD = 0.9
+_completed_results = SemanticMemo(threshold=JOB_REUSE_THRESHOLD)
+
+# Visibility scores given to ChatGPT's top 5 brands, by rank, when the web
+# analysis fails.
+FALLBACK_VISIBILITY_SCORES = (100, 80, 60, 40, 20)
 
 # --- Database Interaction Functions ---
 
-async def update_job_status(analysis_id: str, status: StatusEnum, progress: int = 0, current_step: str = ""):
-    async with AsyncSessionLocal() as session:
-        async with session.begin():
-            stmt = update(Analysis).where(Analysis.id == analysis_id).values(status=status, progress=progress, current_step=current_step)
-            await session.execute(stmt)
-
 async def save_final_result(analysis_id: str, result: dict):
     async with AsyncSessionLocal() as session:
         async with session.begin():
             stmt = update(Analysis).where(Analysis.id == analysis_id).values(status=StatusEnum.COMPLETE, progress=100, current_step="Finished", full_result=result)
             await session.execute(stmt)
+    notify_progress(analysis_id)
 
 async def handle_error(analysis_id: str, error_message: str):
     async with AsyncSessionLocal() as session:
         async with session.begin():
             stmt = update(Analysis).where(Analysis.id == analysis_id).values(status=StatusEnum.ERROR, error_message=error_message, current_step="Error")
             await session.execute(stmt)
+    notify_progress(analysis_id)
+
+def _has_fallback_sections(result: dict) -> bool:
+    """
+    True when any part of a result dict is fallback output rather than a real
+    analysis. Such results are saved for their own job but never reused.
+    """
+    return (
+        result["web_results"]["source"] == "Fallback Analysis"
+        or result["chatgpt_simulation"]["simulated_response"] == chatgpt_fallback_message(result["research_question"])
+        or not FALLBACK_VISUALIZATION_LABELS.isdisjoint(result["visualization"]["top_5_brands"])
+    )
+
+async def _web_analysis_with_visualization(question: str) -> tuple[WebAnalysis, VisualizationData | None]:
+    """
+    Runs the web analysis and, when it succeeds, extracts the visualization from it.
+    The visualization is None when the web analysis failed.
+    """
+    web_analysis = await perform_web_analysis(question)
+    if web_analysis_failed(web_analysis.content):
+        return web_analysis, None
+
+    logger.debug("   ✅ Web analysis succeeded, extracting visualization data...")
+    return web_analysis, await extract_visualization_data(web_analysis_text=web_analysis.content)
 
 # --- Main Background Task (Refactored) ---
 
@@ -38,97 +75,80 @@ async def run_full_analysis(analysis_id: str):
     """
     The main background task orchestrator.
     """
-    print(f"Starting analysis for job ID: {analysis_id}")
+    logger.info("Starting analysis for job ID: %s", analysis_id)
     try:
-        await update_job_status(analysis_id, StatusEnum.PROCESSING, 10, "Fetching research question")
-
+        # Only step boundaries that last long enough to be seen are written:
+        # the question read, result processing and synthesis finish in
+        # milliseconds, so they get no progress update of their own. Marking the job as started
+        # and reading its question share one statement and one commit.
         async with AsyncSessionLocal() as session:
-            analysis_record = await session.get(Analysis, analysis_id)
-            if not analysis_record:
+            async with session.begin():
+                stmt = (
+                    update(Analysis)
+                    .where(Analysis.id == analysis_id)
+                    .values(status=StatusEnum.PROCESSING, progress=20, current_step="Starting parallel data gathering")
+                    .returning(Analysis.research_question)
+                )
+                research_question = (await session.execute(stmt)).scalar_one_or_none()
+            if research_question is None:
                 raise ValueError("Analysis record not found at start of analysis.")
-            research_question = analysis_record.research_question
-
-        await update_job_status(analysis_id, StatusEnum.PROCESSING, 20, "Starting parallel data gathering")
+        notify_progress(analysis_id)
+
+        try:
+            question_embedding = await embed_question(research_question)
+        except Exception as e:
+            logger.warning("[%s] ⚠️ Question embedding failed, running the full pipeline: %s", analysis_id, e)
+            question_embedding = None
+        reused_result = _completed_results.get(question_embedding) if question_embedding is not None else None
+        if reused_result is not None:
+            logger.info("[%s] ♻️ Reusing the result of a semantically similar question", analysis_id)
+            await save_final_result(analysis_id, {**reused_result, "analysis_id": analysis_id, "research_question": research_question})
+            return
 
         # --- Parallel Execution using asyncio.gather ---
-        # This is the core of our async optimization.
-        results = await asyncio.gather(
-            perform_web_analysis(research_question),
+        # This is the core of our async optimization. Visualization extraction
+        # only needs the web analysis, so it is chained onto the web branch and
+        # overlaps the ChatGPT calls.
+        (web_analysis_result, extracted_visualization), chatgpt_simulation_result = await asyncio.gather(
+            _web_analysis_with_visualization(research_question),
             simulate_chatgpt_response(research_question)
         )
         
-        web_analysis_result = results[0]
-        chatgpt_simulation_result = results[1]
-        
-        print(f"[{analysis_id}] Parallel data gathering complete.")
-        
-        await update_job_status(analysis_id, StatusEnum.PROCESSING, 50, "Processing analysis results")
-        
-        # Process the results through our processor module
-        web_analysis_result, chatgpt_simulation_result = process_analysis_results(
-            web_analysis_result, chatgpt_simulation_result
-        )
-        
-        await update_job_status(analysis_id, StatusEnum.SYNTHESIZING, 75, "Synthesizing final report and visualization")
-
-        # Check if web analysis was successful or failed
-        print(f"[{analysis_id}] 🔍 Starting visualization extraction...")
-        print(f"[{analysis_id}] 📝 Web analysis content length: {len(web_analysis_result.content)}")
-        print(f"[{analysis_id}] 📝 Web analysis preview: {web_analysis_result.content[:200]}...")
+        logger.debug("[%s] Parallel data gathering complete.", analysis_id)
         
         # Determine if web analysis was successful or failed
-        if "Unable to perform web analysis" in web_analysis_result.content or "SERP API did not return" in web_analysis_result.content:
+        if extracted_visualization is None:
             # Web analysis failed - create fallback visualization using ChatGPT data
-            print(f"[{analysis_id}] 🔄 Web analysis failed, creating fallback visualization from ChatGPT data...")
+            logger.warning("[%s] 🔄 Web analysis failed, creating fallback visualization from ChatGPT data...", analysis_id)
             
             # Create meaningful visualization data from ChatGPT response
             chatgpt_brands = chatgpt_simulation_result.identified_brands[:5]  # Top 5 brands
             if chatgpt_brands:
-                brand_scores = []
-                for i, brand in enumerate(chatgpt_brands):
-                    brand_scores.append({
-                        "brand_name": brand,
-                        "visibility_score": max(1, 100 - (i * 20)),  # Score from 100 down to 1
-                        "rank": i + 1,
-                        "mentions": 1  # ChatGPT mentioned each brand once
-                    })
-                
-                final_visualization = {
-                    "chart_type": "bar_chart_brand_visibility",
-                    "title": "Top 5 Brands by LLM Search Visibility",
-                    "x_axis_label": "Brand Name",
-                    "y_axis_label": "Visibility Score (1-100)",
-                    "top_5_brands": chatgpt_brands,
-                    "brand_scores": brand_scores,
-                    "methodology_explanation": "Web analysis failed, so brand visibility scores are estimated based on ChatGPT's knowledge ranking. Higher scores indicate brands that ChatGPT considers more prominent in the industry."
-                }
+                final_visualization = VisualizationData(
+                    top_5_brands=chatgpt_brands,
+                    brand_scores=[
+                        BrandVisibilityScore(
+                            brand_name=brand,
+                            visibility_score=score,
+                            rank=i + 1,
+                            mentions=1  # ChatGPT mentioned each brand once
+                        )
+                        for i, (brand, score) in enumerate(zip(chatgpt_brands, FALLBACK_VISIBILITY_SCORES))
+                    ],
+                    methodology_explanation="Web analysis failed, so brand visibility scores are estimated based on ChatGPT's knowledge ranking. Higher scores indicate brands that ChatGPT considers more prominent in the industry."
+                )
             else:
                 # No brands identified by ChatGPT either
-                final_visualization = {
-                    "chart_type": "bar_chart_brand_visibility",
-                    "title": "Top 5 Brands by LLM Search Visibility",
-                    "x_axis_label": "Brand Name",
-                    "y_axis_label": "Visibility Score (1-100)",
-                    "top_5_brands": ["No brands identified"],
-                    "brand_scores": [{
-                        "brand_name": "No brands identified",
-                        "visibility_score": 1,
-                        "rank": 1,
-                        "mentions": 0
-                    }],
-                    "methodology_explanation": "Neither web analysis nor ChatGPT could identify specific brands for this query."
-                }
+                final_visualization = fallback_visualization(
+                    "No brands identified",
+                    "Neither web analysis nor ChatGPT could identify specific brands for this query."
+                )
         else:
-            # Web analysis succeeded - try to extract visualization data normally
-            print(f"[{analysis_id}] ✅ Web analysis succeeded, extracting visualization data...")
-            final_visualization = await extract_visualization_data(
-                web_analysis_text=web_analysis_result.content
-            )
-            # Convert to dict for JSON serialization
-            final_visualization = final_visualization.model_dump()
+            # Web analysis succeeded - use the visualization extracted alongside it
+            final_visualization = extracted_visualization
         
-        print(f"[{analysis_id}] ✅ Visualization extraction complete!")
-        print(f"[{analysis_id}] 📊 Final visualization: {final_visualization}")
+        logger.debug("[%s] ✅ Visualization extraction complete!", analysis_id)
+        logger.debug("[%s] 📊 Final visualization: %s", analysis_id, final_visualization)
 
         final_result = FullAnalysisResult(
             analysis_id=analysis_id,
@@ -139,19 +159,15 @@ async def run_full_analysis(analysis_id: str):
             visualization=final_visualization,
         )
 
-        result_dict = final_result.model_dump()
-        
-        # Convert all datetime fields to ISO format strings for JSON serialization
-        if 'completed_at' in result_dict:
-            result_dict['completed_at'] = result_dict['completed_at'].isoformat()
-        
-        # Convert timestamp in web_results if it exists
-        if 'web_results' in result_dict and 'timestamp' in result_dict['web_results']:
-            result_dict['web_results']['timestamp'] = result_dict['web_results']['timestamp'].isoformat()
+        # mode="json" renders datetimes as ISO strings in the same pass.
+        result_dict = final_result.model_dump(mode="json")
 
         await save_final_result(analysis_id, result_dict)
-        print(f"Successfully completed analysis for job ID: {analysis_id}")
+        # Only complete analyses are offered for reuse.
+        if question_embedding is not None and not _has_fallback_sections(result_dict):
+            _completed_results.put(question_embedding, result_dict)
+        logger.info("Successfully completed analysis for job ID: %s", analysis_id)
 
     except Exception as e:
-        print(f"ERROR during analysis for job ID {analysis_id}: {e}")
+        logger.exception("ERROR during analysis for job ID %s: %s", analysis_id, e)
         await handle_error(analysis_id, str(e))
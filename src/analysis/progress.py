@@ -0,0 +1,27 @@
+# src/analysis/progress.py
+
+import asyncio
+
+# One pending event per analysis with listeners. Notifying pops and sets it, so
+# every listener wakes once and the next wait gets a fresh event.
+_progress_events: dict[str, asyncio.Event] = {}
+
+
+def progress_event(analysis_id: str) -> asyncio.Event:
+    """
+    Returns the event set on the next status change of an analysis. Take it
+    before reading the status so a change in between is not missed.
+    """
+    return _progress_events.setdefault(analysis_id, asyncio.Event())
+
+
+def notify_progress(analysis_id: str):
+    """Wakes everything waiting on a status change of this analysis."""
+    event = _progress_events.pop(analysis_id, None)
+    if event is not None:
+        event.set()
+
+
+def release_progress_event(analysis_id: str):
+    """Drops the pending event of a finished analysis, which will never be notified again."""
+    _progress_events.pop(analysis_id, None)
@@ -1,129 +1,215 @@
 # src/analysis/visualizer.py
-import json
+import logging
+import re
 
+import orjson
+
+from analysis.cache import completion_cache_key, get_cached_completion, store_completion
 from analysis.clients import openai_client
 from schemas import VisualizationData, BrandVisibilityScore
 
+logger = logging.getLogger(__name__)
+
+# Sentinel phrases placed in the analysis text by upstream fallbacks, in
+# priority order: when a text holds several, the first listed one classifies it,
+# wherever each appears in the text. One compiled alternation finds every marker
+# present in a single scan.
+WEB_ANALYSIS_FAILURE_MARKERS = ("Unable to perform web analysis", "SERP API did not return")
+NO_BRANDS_MARKER = "No brand information could be extracted"
+FALLBACK_MARKERS = (*WEB_ANALYSIS_FAILURE_MARKERS, NO_BRANDS_MARKER)
+FALLBACK_MARKER_PATTERN = re.compile("|".join(map(re.escape, FALLBACK_MARKERS)))
+_MARKER_PRIORITY = {marker: rank for rank, marker in enumerate(FALLBACK_MARKERS)}
+
+
+def find_fallback_marker(text: str) -> str | None:
+    """Returns the highest-priority fallback marker present in `text`, if any."""
+    found = {match.group() for match in FALLBACK_MARKER_PATTERN.finditer(text)}
+    return min(found, key=_MARKER_PRIORITY.__getitem__, default=None)
+
+
+def web_analysis_failed(text: str) -> bool:
+    return find_fallback_marker(text) in WEB_ANALYSIS_FAILURE_MARKERS
+
+
+def fallback_visualization(label: str, explanation: str) -> VisualizationData:
+    """
+    A placeholder chart with a single `label` bar, used when no brands could be
+    extracted. Chart type, title and axis labels come from the model defaults.
+    """
+    return VisualizationData(
+        top_5_brands=[label],
+        brand_scores=[BrandVisibilityScore(brand_name=label, visibility_score=1, rank=1, mentions=0)],
+        methodology_explanation=explanation
+    )
+
+
+# Labels of every placeholder chart, so results carrying one can be told apart
+# from real extractions.
+FALLBACK_VISUALIZATION_LABELS = frozenset({
+    "Insufficient content",
+    "Web analysis unavailable",
+    "Brand data unavailable",
+    "Analysis error",
+    "No brands identified",
+})
+
+# Brand extraction is a structured enumeration task, so it runs on the smaller,
+# faster model; an answer that does not validate is retried once on gpt-4o.
+VISUALIZATION_MODEL = "gpt-4o-mini"
+VISUALIZATION_ESCALATION_MODEL = "gpt-4o"
+
+# Token budget for the analysis text sent for extraction, converted to
+# characters with OpenAI's ~4 characters-per-token rule of thumb for English.
+VISUALIZATION_TEXT_MAX_TOKENS = 2500
+VISUALIZATION_TEXT_MAX_CHARS = VISUALIZATION_TEXT_MAX_TOKENS * 4
+
+# Analysis text shorter than this has no brands worth ranking, so it gets the
+# placeholder chart without an extraction call.
+VISUALIZATION_TEXT_MIN_CHARS = 200
+
+# Built once and byte-identical on every request, which also lets OpenAI's
+# prompt caching reuse the prefix.
+VISUALIZATION_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": """You are a highly precise data analysis and extraction engine. Your only output must be a single, valid JSON object that strictly adheres to the requested format. Do not include any other text or apologies.
+
+The user will send a summary of web search results for a specific query.
+Your task is to identify the top 5 most prominent brands mentioned.
+
+You must perform the following steps:
+1.  **Identify Brands**: Scan the text to find all mentioned brand names.
+2.  **Count Mentions**: Tally the number of times each brand is mentioned.
+3.  **Assess Prominence**: Evaluate the prominence of each mention. Brands mentioned earlier, in headlines, or as primary recommendations are more prominent.
+4.  **Calculate Visibility Score**: Based on a combination of mention count and prominence, calculate a 'visibility_score' for each brand on a scale of 1 to 100.
+5.  **Rank Brands**: Rank the top 5 brands from 1 to 5 based on their score.
+6.  **Explain Methodology**: Briefly (1-2 sentences) explain the specific factors you used from the text to determine the scores. For example: "Scores were based on mention frequency and prominence in lists of 'best' brands.\"""",
+}
+
+# JSON schema for the extraction response. Strict structured outputs guarantee
+# a parseable object with exactly these fields; the chart labels come from the
+# VisualizationData defaults.
+VISUALIZATION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "visualization_data",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "top_5_brands": {"type": "array", "items": {"type": "string"}},
+                "brand_scores": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "brand_name": {"type": "string"},
+                            "visibility_score": {"type": "integer"},
+                            "rank": {"type": "integer"},
+                            "mentions": {"type": "integer"},
+                        },
+                        "required": ["brand_name", "visibility_score", "rank", "mentions"],
+                        "additionalProperties": False,
+                    },
+                },
+                "methodology_explanation": {"type": "string"},
+            },
+            "required": ["top_5_brands", "brand_scores", "methodology_explanation"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+async def _request_extraction(model: str, extraction_prompt: str) -> VisualizationData:
+    """
+    Requests the visualization package from `model` and validates it. Identical
+    requests reuse the stored extraction instead of calling the API again; only
+    extractions that validate are cached.
+    """
+    request = {
+        "model": model,
+        "messages": [
+            VISUALIZATION_SYSTEM_MESSAGE,
+            {"role": "user", "content": extraction_prompt}
+        ],
+        "response_format": VISUALIZATION_RESPONSE_FORMAT,
+    }
+    cache_key = completion_cache_key(request)
+    content = await get_cached_completion(cache_key)
+    cache_hit = content is not None
+    if cache_hit:
+        logger.info("   ♻️ Reusing cached visualization extraction")
+    else:
+        response = await openai_client.chat.completions.create(**request)
+        content = response.choices[0].message.content
+        logger.debug("   ✅ OpenAI response received: %d characters", len(content))
+        logger.debug("   📄 Response content: %s", content)
+    
+    extracted_data = orjson.loads(content)
+    logger.debug("   🔍 Parsed JSON data: %s", extracted_data)
+    
+    # Validate the entire JSON object against our Pydantic model
+    visualization_package = VisualizationData(**extracted_data)
+    # Stored only on a miss, so a hit neither writes nor extends the entry's expiry.
+    if not cache_hit:
+        await store_completion(cache_key, content)
+    return visualization_package
+
 async def extract_visualization_data(web_analysis_text: str) -> VisualizationData:
     """
     Uses a final LLM call to extract a structured visualization package from the web analysis text.
     The LLM is prompted to be transparent about its methodology.
     """
-    print("   📊 Extracting structured visualization data from web analysis...")
-    print(f"   📝 Input text length: {len(web_analysis_text)} characters")
-    print(f"   📝 Input text preview: {web_analysis_text[:200]}...")
+    logger.info("   📊 Extracting structured visualization data from web analysis...")
+    logger.debug("   📝 Input text length: %d characters", len(web_analysis_text))
+    logger.debug("   📝 Input text preview: %.200s...", web_analysis_text)
+
+    if len(web_analysis_text.strip()) < VISUALIZATION_TEXT_MIN_CHARS:
+        logger.info("   ⏭️ Web analysis text too short, skipping visualization extraction")
+        return fallback_visualization(
+            "Insufficient content",
+            "The web analysis text was too short to extract brand visibility data from."
+        )
     
-    extraction_prompt = f"""
-    Analyze the following text, which is a summary of web search results for a specific query.
-    Your task is to identify the top 5 most prominent brands mentioned.
-
-    You must perform the following steps:
-    1.  **Identify Brands**: Scan the text to find all mentioned brand names.
-    2.  **Count Mentions**: Tally the number of times each brand is mentioned.
-    3.  **Assess Prominence**: Evaluate the prominence of each mention. Brands mentioned earlier, in headlines, or as primary recommendations are more prominent.
-    4.  **Calculate Visibility Score**: Based on a combination of mention count and prominence, calculate a 'visibility_score' for each brand on a scale of 1 to 100.
-    5.  **Rank Brands**: Rank the top 5 brands from 1 to 5 based on their score.
-    6.  **Explain Methodology**: Briefly (1-2 sentences) explain the specific factors you used from the text to determine the scores. For example: "Scores were based on mention frequency and prominence in lists of 'best' brands."
-
-    Your response MUST be a single, valid JSON object that strictly follows this structure:
-    {{
-      "top_5_brands": ["Brand A", "Brand B", ...],
-      "brand_scores": [
-        {{ "brand_name": "Brand A", "visibility_score": 95, "rank": 1, "mentions": 8 }},
-        {{ "brand_name": "Brand B", "visibility_score": 90, "rank": 2, "mentions": 6 }},
-        ...
-      ],
-      "methodology_explanation": "Your explanation here."
-    }}
-
-    --- WEB ANALYSIS TEXT TO ANALYZE ---
-    {web_analysis_text[:10000]}
-    """
+    # The extraction instructions live in the system message, so only the text
+    # to analyze varies and the prompt prefix stays cacheable.
+    extraction_prompt = f"""--- WEB ANALYSIS TEXT TO ANALYZE ---
+{web_analysis_text[:VISUALIZATION_TEXT_MAX_CHARS]}"""
     
-    print("   🤖 Making OpenAI call for visualization extraction...")
+    logger.debug("   🤖 Making OpenAI call for visualization extraction...")
     
     try:
-        response = await openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a highly precise data analysis and extraction engine. Your only output must be a single, valid JSON object that strictly adheres to the user's requested format. Do not include any other text or apologies."},
-                {"role": "user", "content": extraction_prompt}
-            ],
-            response_format={"type": "json_object"}
-        )
+        try:
+            visualization_package = await _request_extraction(VISUALIZATION_MODEL, extraction_prompt)
+        except ValueError as e:
+            # Values the schema cannot express, such as a visibility_score outside
+            # 1-100, fail validation as a ValueError; the larger model gets one
+            # attempt at the same prompt.
+            logger.warning("   ⚠️ %s extraction did not validate, retrying with %s: %s", VISUALIZATION_MODEL, VISUALIZATION_ESCALATION_MODEL, e)
+            visualization_package = await _request_extraction(VISUALIZATION_ESCALATION_MODEL, extraction_prompt)
         
-        print(f"   ✅ OpenAI response received: {len(response.choices[0].message.content)} characters")
-        print(f"   📄 Response content: {response.choices[0].message.content}")
-        
-        extracted_data = json.loads(response.choices[0].message.content)
-        print(f"   🔍 Parsed JSON data: {extracted_data}")
-        
-        # Validate the entire JSON object against our Pydantic model
-        visualization_package = VisualizationData(**extracted_data)
-        
-        print(f"   ✅ Successfully extracted and validated visualization package.")
-        print(f"   📊 Package contains {len(visualization_package.brand_scores)} brand scores")
+        logger.debug("   ✅ Successfully extracted and validated visualization package.")
+        logger.debug("   📊 Package contains %d brand scores", len(visualization_package.brand_scores))
         return visualization_package
 
     except Exception as e:
-        print(f"   ❌ Error extracting visualization data: {e}")
-        print(f"   🔍 Error type: {type(e).__name__}")
-        import traceback
-        print(f"   📋 Full traceback: {traceback.format_exc()}")
+        # The traceback is only formatted if a handler actually emits the record.
+        logger.exception("   ❌ Error extracting visualization data (%s): %s", type(e).__name__, e)
         
         # Check if this is due to failed web analysis
-        if "Unable to perform web analysis" in web_analysis_text or "SERP API did not return" in web_analysis_text:
+        marker = find_fallback_marker(web_analysis_text)
+        if marker in WEB_ANALYSIS_FAILURE_MARKERS:
             # When web analysis fails, we can't extract brand visibility from search results
             # But we can provide a meaningful message about why the data is limited
-            return VisualizationData(
-                chart_type="bar_chart_brand_visibility",
-                title="Top 5 Brands by LLM Search Visibility",
-                x_axis_label="Brand Name",
-                y_axis_label="Visibility Score (1-100)",
-                top_5_brands=["Web analysis unavailable"],
-                brand_scores=[
-                    {
-                        "brand_name": "Web analysis unavailable",
-                        "visibility_score": 1,
-                        "rank": 1,
-                        "mentions": 0
-                    }
-                ],
-                methodology_explanation="Web analysis failed, so brand visibility data could not be extracted from search results. The system fell back to ChatGPT knowledge only, which provides general information but not search-based visibility metrics."
+            return fallback_visualization(
+                "Web analysis unavailable",
+                "Web analysis failed, so brand visibility data could not be extracted from search results. The system fell back to ChatGPT knowledge only, which provides general information but not search-based visibility metrics."
             )
-        elif "No brand information could be extracted" in web_analysis_text:
+        elif marker == NO_BRANDS_MARKER:
             # Handle the case where the LLM couldn't extract brand data
-            return VisualizationData(
-                chart_type="bar_chart_brand_visibility",
-                title="Top 5 Brands by LLM Search Visibility",
-                x_axis_label="Brand Name",
-                y_axis_label="Visibility Score (1-100)",
-                top_5_brands=["Brand data unavailable"],
-                brand_scores=[
-                    {
-                        "brand_name": "Brand data unavailable",
-                        "visibility_score": 1,
-                        "rank": 1,
-                        "mentions": 0
-                    }
-                ],
-                methodology_explanation="The LLM was unable to extract brand information from the provided text. This may be due to insufficient content or formatting issues."
+            return fallback_visualization(
+                "Brand data unavailable",
+                "The LLM was unable to extract brand information from the provided text. This may be due to insufficient content or formatting issues."
             )
         else:
             # Return a fallback object that conforms to the schema for other errors
-            return VisualizationData(
-                chart_type="bar_chart_brand_visibility",
-                title="Top 5 Brands by LLM Search Visibility",
-                x_axis_label="Brand Name",
-                y_axis_label="Visibility Score (1-100)",
-                top_5_brands=["Analysis error"],
-                brand_scores=[
-                    {
-                        "brand_name": "Analysis error",
-                        "visibility_score": 1,
-                        "rank": 1,
-                        "mentions": 0
-                    }
-                ],
-                methodology_explanation=f"Data extraction failed due to an error: {e}"
-            )
+            return fallback_visualization("Analysis error", f"Data extraction failed due to an error: {e}")
@@ -4,6 +4,7 @@ from sqlalchemy import MetaData
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncAttrs
 from sqlalchemy.orm import DeclarativeBase
 import os # Keep os for getenv
+import orjson
 
 # Define a naming convention for all database constraints.
 # This makes your database schema clean and predictable.
@@ -21,9 +22,33 @@ DATABASE_NAMING_CONVENTION = {
 # Use SQLite for development (can be overridden by DATABASE_URL env var)
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./llm_insights.db")
 
-engine = create_async_engine(DATABASE_URL, echo=True)
-
-AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+# JSON columns are encoded and decoded with orjson instead of the stdlib json module.
+engine_options = {
+    # Per-statement SQL logging is opt-in; it is costly on the status-polling path.
+    "echo": os.getenv("SQL_ECHO", "").lower() == "true",
+    "json_serializer": lambda obj: orjson.dumps(obj).decode(),
+    "json_deserializer": orjson.loads,
+}
+# Pool sizing for server databases; SQLite's file-based pool keeps its defaults.
+if not DATABASE_URL.startswith("sqlite"):
+    engine_options.update(pool_size=20, max_overflow=20, pool_timeout=30, pool_recycle=1800, pool_pre_ping=True)
+
+# asyncpg caches prepared statements per connection, which keeps the plans of
+# the few hot queries warm. PgBouncer in transaction mode cannot route them to
+# the connection that prepared them, so DATABASE_PGBOUNCER=true turns it off.
+PREPARED_STATEMENT_CACHE_SIZE = 256
+if DATABASE_URL.startswith("postgresql+asyncpg"):
+    behind_pgbouncer = os.getenv("DATABASE_PGBOUNCER", "").lower() == "true"
+    engine_options["connect_args"] = {
+        "prepared_statement_cache_size": 0 if behind_pgbouncer else PREPARED_STATEMENT_CACHE_SIZE,
+        "statement_cache_size": 0 if behind_pgbouncer else PREPARED_STATEMENT_CACHE_SIZE,
+    }
+
+engine = create_async_engine(DATABASE_URL, **engine_options)
+
+# Sessions never expire loaded attributes on commit and never autoflush, so
+# the job's status writes don't trigger extra SELECTs.
+AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
 
 # Create a MetaData object with the naming convention
 metadata_obj = MetaData(naming_convention=DATABASE_NAMING_CONVENTION)
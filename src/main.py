@@ -4,16 +4,27 @@ from datetime import datetime, timezone, timedelta
 from dotenv import load_dotenv
 load_dotenv()
 
-import uuid
+import asyncio
+import gzip
+import hashlib
+import logging
+import logging.handlers
+import os
+import queue
+import time
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks
+import orjson
+
+from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from sqlalchemy import Text, case, insert, select, type_coerce
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
 # Import project components
 from database import engine, Base, AsyncSessionLocal
-from models import Analysis
+from models import Analysis, new_analysis_id
 from schemas import (
     AnalysisRequest,
     AnalysisResponse,
@@ -24,18 +35,147 @@ from schemas import (
     StatusEnum,
 )
 from analysis.orchestrator import run_full_analysis 
+from analysis.clients import openai_client, brightdata_client
+from analysis.progress import progress_event, release_progress_event
+
+logger = logging.getLogger(__name__)
+
+# A status stream re-sends the current state at least this often, so idle
+# connections stay open through proxies.
+STATUS_STREAM_HEARTBEAT_SECONDS = 15
+
+# Completed results never change, so their serialized JSON is gzip-compressed
+# once, kept in-process and served as-is on repeat requests until the analysis
+# expires. Oldest entries are evicted first.
+RESULT_CACHE_MAX_ENTRIES = 256
+RESULT_GZIP_LEVEL = 6
+_result_cache: dict[str, tuple[datetime, str, bytes]] = {}
+
+# Concurrent pollers of one job share a status read for this long, collapsing
+# their primary-key lookups to a couple per second.
+STATUS_CACHE_TTL_SECONDS = 0.5
+STATUS_CACHE_MAX_ENTRIES = 10_000
+_status_cache: dict[str, tuple[float, bytes]] = {}
+
+# Strong references to running analysis tasks; the event loop only keeps weak ones.
+_analysis_tasks: set[asyncio.Task] = set()
+
+# Caps the pipelines running at once in this process; further jobs stay QUEUED
+# until a slot frees up. Tune against the OpenAI rate limit rather than the
+# request rate.
+ANALYSIS_MAX_CONCURRENCY = int(os.getenv("ANALYSIS_MAX_CONCURRENCY", 10))
+_analysis_semaphore = asyncio.Semaphore(ANALYSIS_MAX_CONCURRENCY)
+
+# Rescheduling unfinished jobs at startup is opt-in. Every process that starts
+# would resume every unfinished job, so it is only safe with a single worker
+# and no overlapping restarts.
+RESUME_UNFINISHED_ANALYSES = os.getenv("RESUME_UNFINISHED_ANALYSES", "").lower() == "true"
+
+# Jobs still running, keyed on the hash of their normalized research question.
+# A repeat submission of a running question gets the existing job's id back.
+_inflight_jobs: dict[str, str] = {}
+
+
+def question_key(question: str) -> str:
+    return hashlib.sha256(question.strip().lower().encode()).hexdigest()
+
+# --- Logging ---
+
+def configure_logging() -> logging.handlers.QueueListener:
+    """
+    Routes all log records through an in-memory queue. Emitting a record is just an
+    enqueue; a background listener thread does the actual stdout writes, so logging
+    never blocks the event loop.
+    """
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root_logger = logging.getLogger()
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    root_logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    return logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+
 
 # --- Application Lifecycle ---
 
+def create_missing_indexes(connection):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+def schedule_analysis(analysis_id: str, research_question: str) -> None:
+    """Runs the analysis pipeline for a job as a task on the event loop."""
+    key = question_key(research_question)
+    _inflight_jobs[key] = analysis_id
+
+    def finished(task: asyncio.Task) -> None:
+        _analysis_tasks.discard(task)
+        if _inflight_jobs.get(key) == analysis_id:
+            del _inflight_jobs[key]
+
+    async def run() -> None:
+        async with _analysis_semaphore:
+            await run_full_analysis(analysis_id)
+
+    task = asyncio.create_task(run())
+    _analysis_tasks.add(task)
+    task.add_done_callback(finished)
+
+
+async def resume_unfinished_analyses() -> None:
+    """
+    Reschedules jobs left queued or mid-run by a previous process. The job row is
+    the durable record, so a restart loses no submitted work. Only called when
+    RESUME_UNFINISHED_ANALYSES is set.
+    """
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(Analysis.id, Analysis.research_question).where(Analysis.status.not_in([StatusEnum.COMPLETE, StatusEnum.ERROR]))
+        )
+        unfinished = result.all()
+    for analysis_id, research_question in unfinished:
+        schedule_analysis(analysis_id, research_question)
+    if unfinished:
+        logger.info("Resumed %d unfinished analysis job(s).", len(unfinished))
+
+
+async def warm_up_openai_client() -> None:
+    """
+    Opens the OpenAI client's first pooled connection with a free model lookup,
+    so the first job does not pay the TCP+TLS handshake.
+    """
+    try:
+        await openai_client.models.retrieve("gpt-4o")
+    except Exception as e:
+        logger.warning("OpenAI connection warm-up failed: %s", e)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # On startup
-    print("Application startup: Creating database tables...")
+    log_listener = configure_logging()
+    log_listener.start()
+    logger.info("Application startup: Creating database tables...")
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # create_all skips tables that already exist, so indexes added to an
+        # existing table are created here.
+        await conn.run_sync(create_missing_indexes)
+    if RESUME_UNFINISHED_ANALYSES:
+        await resume_unfinished_analyses()
+    # Runs alongside the first requests rather than delaying startup.
+    warm_up_task = asyncio.create_task(warm_up_openai_client())
     yield
     # On shutdown
-    print("Application shutdown.")
+    warm_up_task.cancel()
+    for task in _analysis_tasks:
+        task.cancel()
+    await asyncio.gather(*_analysis_tasks, return_exceptions=True)
+    await brightdata_client.aclose()
+    await openai_client.close()
+    logger.info("Application shutdown.")
+    log_listener.stop()
 
 
 # --- FastAPI App Initialization ---
@@ -44,6 +184,7 @@ app = FastAPI(
     title="LLM Search Insight API",
     version="5.1",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     responses={
         404: {"model": ErrorResponse, "description": "Resource Not Found"},
         500: {"model": ErrorResponse, "description": "Internal Server Error"},
@@ -56,10 +197,7 @@ app = FastAPI(
 async def get_db() -> AsyncSession:
     """Dependency that provides a database session for each request."""
     async with AsyncSessionLocal() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
+        yield session
 
 async def get_analysis_by_id(
     analysis_id: str, db: AsyncSession = Depends(get_db)
@@ -76,6 +214,101 @@ async def get_analysis_by_id(
     return analysis
 
 
+async def fetch_row(stmt):
+    """
+    Runs a read-only Core query on a pooled connection and returns its first row.
+    The polling endpoints use this instead of the get_db session: no ORM session is
+    built per request, and requests served from the in-process caches never touch
+    the pool at all.
+    """
+    async with engine.connect() as conn:
+        return (await conn.execute(stmt)).first()
+
+
+async def read_status(analysis_id: str):
+    """
+    Reads the status columns of an analysis. The full_result blob is only read
+    once the job is COMPLETE, as its stored JSON text; running jobs get NULL.
+    """
+    stmt = select(
+        Analysis.status,
+        Analysis.progress,
+        Analysis.current_step,
+        Analysis.error_message,
+        case((Analysis.status == StatusEnum.COMPLETE, type_coerce(Analysis.full_result, Text))).label("result"),
+    ).where(Analysis.id == analysis_id)
+    return await fetch_row(stmt)
+
+
+def status_body(row) -> bytes:
+    """
+    Serializes a status row as a StatusResponse. The body is returned as a raw
+    Response, so FastAPI does not re-validate it against response_model (kept for
+    the OpenAPI schema), and the stored result is embedded as-is rather than
+    decoded and re-encoded.
+    """
+    return orjson.dumps({
+        **StatusResponse(
+            status=row.status,
+            progress=row.progress,
+            current_step=row.current_step,
+            error_message=row.error_message
+        ).model_dump(mode="json"),
+        "result": orjson.Fragment(row.result) if row.result is not None else None,
+    })
+
+
+def if_none_match(request: Request, etag: str) -> bool:
+    """
+    True when the request's If-None-Match lists `etag` or is `*`. The header uses
+    weak comparison, so a W/ prefix on a listed tag is ignored.
+    """
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def accepts_gzip(request: Request) -> bool:
+    """
+    True when Accept-Encoding allows gzip with a nonzero q-value, either by name or
+    through `*`. A gzip entry takes precedence over `*`, so "gzip;q=0" and
+    "identity, *;q=0" both rule it out.
+    """
+    qualities = {}
+    for item in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = item.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
+def result_response(request: Request, digest: str, compressed: bytes) -> Response:
+    """
+    Sends a gzip-compressed result body as-is, or inflated for clients that do not
+    accept gzip. The two encodings are distinct representations, so each gets its
+    own strong ETag derived from the body's `digest`. Completed results never
+    change, so a client already holding the representation gets an empty 304.
+    """
+    use_gzip = accepts_gzip(request)
+    etag = f'"{digest}-gz"' if use_gzip else f'"{digest}"'
+    headers = {"Vary": "Accept-Encoding", "ETag": etag}
+    if if_none_match(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=compressed, media_type="application/json", headers=headers)
+    return Response(content=gzip.decompress(compressed), media_type="application/json", headers=headers)
+
+
 # --- API Endpoints ---
 
 @app.post(
@@ -86,28 +319,43 @@ async def get_analysis_by_id(
 )
 async def submit_analysis(
     request: AnalysisRequest,
-    background_tasks: BackgroundTasks,
+    response: Response,
     db: AsyncSession = Depends(get_db),
 ):
     """
     Accepts a research question, creates a new analysis job record in the database,
-    and queues the analysis to be run in the background.
+    and queues the analysis to be run in the background. If the same question is
+    already being analyzed, the running job's id is returned with 200 instead.
     """
-    new_analysis = Analysis(
-        id=str(uuid.uuid4()),
-        research_question=request.research_question,
-        status=StatusEnum.QUEUED,
-        progress=0,
+    existing_id = _inflight_jobs.get(question_key(request.research_question))
+    if existing_id is not None:
+        # The job may still be waiting for a concurrency slot, so report the
+        # status it actually has rather than assuming it is processing.
+        existing_status = await db.scalar(select(Analysis.status).where(Analysis.id == existing_id))
+        if existing_status is not None:
+            response.status_code = status.HTTP_200_OK
+            return AnalysisResponse(analysis_id=existing_id, status=existing_status)
+
+    # A Core INSERT with a client-side id is the whole write: one statement,
+    # no ORM identity-map bookkeeping and nothing to read back.
+    analysis_id = new_analysis_id()
+    await db.execute(
+        insert(Analysis).values(
+            id=analysis_id,
+            research_question=request.research_question,
+            status=StatusEnum.QUEUED,
+            progress=0,
+        )
     )
-    db.add(new_analysis)
     await db.commit()
-    await db.refresh(new_analysis)
 
-    background_tasks.add_task(run_full_analysis, new_analysis.id)
+    # Scheduled on the event loop directly rather than as a response background
+    # task, so the analysis is decoupled from this request's lifecycle.
+    schedule_analysis(analysis_id, request.research_question)
 
     return AnalysisResponse(
-        analysis_id=new_analysis.id,
-        status=new_analysis.status
+        analysis_id=analysis_id,
+        status=StatusEnum.QUEUED
     )
 
 @app.get(
@@ -115,36 +363,116 @@ async def submit_analysis(
     response_model=StatusResponse,
     summary="Check analysis job status",
 )
-async def get_analysis_status(analysis: Analysis = Depends(get_analysis_by_id)):
+async def get_analysis_status(analysis_id: str):
     """
     Poll this endpoint to get the current status and progress of an analysis job.
     """
-    return StatusResponse(
-        status=analysis.status,
-        progress=analysis.progress,
-        current_step=analysis.current_step,
-        error_message=analysis.error_message
-    )
+    cached = _status_cache.get(analysis_id)
+    if cached is not None and time.monotonic() - cached[0] < STATUS_CACHE_TTL_SECONDS:
+        return Response(content=cached[1], media_type="application/json")
+
+    row = await read_status(analysis_id)
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": ErrorType.NOT_FOUND, "details": {"message": "Analysis ID not found"}},
+        )
+    body = status_body(row)
+    # Re-inserted below, so insertion order stays oldest-first.
+    _status_cache.pop(analysis_id, None)
+    if len(_status_cache) >= STATUS_CACHE_MAX_ENTRIES:
+        now = time.monotonic()
+        for key in [key for key, (fetched_at, _) in _status_cache.items() if now - fetched_at >= STATUS_CACHE_TTL_SECONDS]:
+            del _status_cache[key]
+        # Every entry is still fresh: drop the oldest, so the cap always holds.
+        if len(_status_cache) >= STATUS_CACHE_MAX_ENTRIES:
+            del _status_cache[next(iter(_status_cache))]
+    # Stamped after the query returns, so a slow read does not shorten the window.
+    _status_cache[analysis_id] = (time.monotonic(), body)
+    return Response(content=body, media_type="application/json")
+
+@app.get(
+    "/api/v1/analyze/{analysis_id}/status/stream",
+    summary="Stream analysis job status",
+    response_class=StreamingResponse,
+)
+async def stream_analysis_status(analysis_id: str):
+    """
+    Server-sent events alternative to polling the status endpoint. Pushes a
+    StatusResponse whenever the job's status changes and closes the stream once
+    the job is COMPLETE (with the result attached) or ERROR.
+    """
+    changed = progress_event(analysis_id)
+    row = await read_status(analysis_id)
+    if row is None:
+        release_progress_event(analysis_id)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": ErrorType.NOT_FOUND, "details": {"message": "Analysis ID not found"}},
+        )
+
+    async def events():
+        nonlocal changed, row
+        while row is not None:
+            yield b"data: " + status_body(row) + b"\n\n"
+            if row.status in (StatusEnum.COMPLETE, StatusEnum.ERROR):
+                release_progress_event(analysis_id)
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), STATUS_STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            changed = progress_event(analysis_id)
+            row = await read_status(analysis_id)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
 
 @app.get(
     "/api/v1/analyze/{analysis_id}",
     response_model=FullAnalysisResult,
     summary="Get final analysis results",
 )
-async def get_analysis_result(analysis: Analysis = Depends(get_analysis_by_id)):
+async def get_analysis_result(analysis_id: str, request: Request):
     """
     Retrieve the full analysis report once the status is COMPLETE.
     """
-    if analysis.status != StatusEnum.COMPLETE:
+    cached = _result_cache.get(analysis_id)
+    if cached is not None:
+        expires_at, digest, compressed = cached
+        if expires_at > datetime.now(timezone.utc):
+            return result_response(request, digest, compressed)
+        del _result_cache[analysis_id]
+
+    # full_result is read as its stored JSON text, so it is served without being
+    # decoded into Python objects and re-encoded.
+    stmt = select(
+        Analysis.status,
+        Analysis.expires_at,
+        type_coerce(Analysis.full_result, Text).label("full_result"),
+    ).where(Analysis.id == analysis_id)
+    row = await fetch_row(stmt)
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": ErrorType.NOT_FOUND, "details": {"message": "Analysis ID not found"}},
+        )
+    if row.status != StatusEnum.COMPLETE:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail={"error": ErrorType.NOT_FOUND, "details": {"message": "Result not found or not complete"}},
         )
         
     # TODO: Implement expiration filtering
-    
-    return analysis.full_result
+
+    body = row.full_result.encode()
+    digest = hashlib.sha256(body).hexdigest()
+    compressed = gzip.compress(body, compresslevel=RESULT_GZIP_LEVEL)
+    if len(_result_cache) >= RESULT_CACHE_MAX_ENTRIES:
+        del _result_cache[next(iter(_result_cache))]
+    # SQLite hands back naive datetimes; every stored timestamp is UTC.
+    _result_cache[analysis_id] = (row.expires_at.replace(tzinfo=timezone.utc), digest, compressed)
+    return result_response(request, digest, compressed)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop="uvloop", http="httptools")
\ No newline at end of file
@@ -1,22 +1,50 @@
 # models.py
 
+import time
 import uuid
 from datetime import datetime, timedelta, timezone
-from sqlalchemy import String, DateTime, Integer, JSON, Text
+from sqlalchemy import String, DateTime, Integer, JSON, Text, Index, text
 from sqlalchemy.orm import Mapped, mapped_column
 from database import Base
 from schemas import StatusEnum
 import os # Keep os for getenv
 
 CACHE_TTL_HOURS = int(os.getenv("CACHE_TTL_HOURS", 24))
+# Built once at import; every insert reuses it.
+CACHE_TTL = timedelta(hours=CACHE_TTL_HOURS)
 
 def get_expiration_time():
-    return datetime.now(timezone.utc) + timedelta(hours=CACHE_TTL_HOURS)
+    return datetime.now(timezone.utc) + CACHE_TTL
+
+def new_analysis_id() -> str:
+    """
+    Returns a UUIDv7: a 48-bit millisecond timestamp followed by random bits.
+    Ids sort by creation time, so primary-key inserts append to the index
+    instead of landing on random pages.
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = (value & ~(0xF << 76)) | (0x7 << 76)  # version 7
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # RFC 4122 variant
+    return str(uuid.UUID(int=value))
 
 class Analysis(Base):
     __tablename__ = "analyses"
+    __table_args__ = (
+        # Serves status filters and expiration sweeps over the whole table.
+        Index("ix_analyses_status_expires", "status", "expires_at"),
+        # Partial index over completed results only, which is all an expiry check reads.
+        Index(
+            "ix_analyses_expires_active",
+            "expires_at",
+            postgresql_where=text("status = 'COMPLETE'"),
+            sqlite_where=text("status = 'COMPLETE'"),
+        ),
+    )
 
-    id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    # The canonical dashed UUID string, the form the API and both CLIs use. Kept
+    # as a string column: create_all never alters an existing column, so a native
+    # UUID type would break deployments whose tables already hold varchar ids.
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=new_analysis_id)
     research_question: Mapped[str] = mapped_column(String(500))
     status: Mapped[str] = mapped_column(String(50), default=StatusEnum.QUEUED)
     progress: Mapped[int] = mapped_column(default=0)
@@ -25,4 +53,14 @@ class Analysis(Base):
     full_result: Mapped[dict | None] = mapped_column(JSON, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), onupdate=lambda: datetime.now(timezone.utc))
-    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=get_expiration_time)
\ No newline at end of file
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=get_expiration_time)
+
+
+class LLMCacheEntry(Base):
+    """A cached OpenAI completion, keyed by the SHA-256 of its request parameters."""
+    __tablename__ = "llm_cache"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    response: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=get_expiration_time)
@@ -0,0 +1,15 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# The src modules import each other as top-level modules (`from database import ...`),
+# so src goes first on the path, ahead of the legacy modules in the project root.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+# Set before any src module is imported: analysis.clients requires API keys at
+# import time, and database.py reads DATABASE_URL once. No test calls out.
+os.environ.setdefault("OPENAI_API_KEY", "test-openai-key")
+os.environ.setdefault("BRIGHTDATA_API_KEY", "test-brightdata-key")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/test.db"
@@ -0,0 +1,111 @@
+# tests/test_orchestrator.py
+import asyncio
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from sqlalchemy import insert, select
+
+from analysis import orchestrator
+from analysis.collector import chatgpt_fallback_message
+from analysis.memoize import SemanticMemo
+from analysis.visualizer import fallback_visualization
+from database import AsyncSessionLocal, Base, engine
+from models import Analysis, new_analysis_id
+from schemas import BrandVisibilityScore, ChatGPTResponse, StatusEnum, VisualizationData, WebAnalysis
+
+QUESTION = "What are the best project management tools for small teams?"
+# Every question embeds to the same vector, so each job is a reuse candidate.
+EMBEDDING = np.full(8, 1 / np.sqrt(8), dtype=np.float32)
+
+
+def web_analysis(source: str = "OpenAI Simulated Web Analysis") -> WebAnalysis:
+    return WebAnalysis(source=source, content="Asana and Trello lead most lists.", timestamp=datetime.now(timezone.utc), confidence_score=0.95)
+
+
+def chatgpt_response(answer: str = "Asana and Trello are popular choices.") -> ChatGPTResponse:
+    return ChatGPTResponse(simulated_response=answer, identified_brands=["Asana", "Trello"])
+
+
+def visualization() -> VisualizationData:
+    return VisualizationData(
+        top_5_brands=["Asana"],
+        brand_scores=[BrandVisibilityScore(brand_name="Asana", visibility_score=90, rank=1, mentions=3)],
+        methodology_explanation="Scores follow mention frequency.",
+    )
+
+
+COMPLETE = (web_analysis(), visualization(), chatgpt_response())
+DEGRADED = {
+    "fallback web analysis": (web_analysis(source="Fallback Analysis"), None, chatgpt_response()),
+    "fallback chatgpt answer": (web_analysis(), visualization(), chatgpt_response(chatgpt_fallback_message(QUESTION))),
+    "failed extraction": (web_analysis(), fallback_visualization("Analysis error", "Data extraction failed."), chatgpt_response()),
+    "insufficient content": (web_analysis(), fallback_visualization("Insufficient content", "Too short."), chatgpt_response()),
+}
+
+
+@pytest.fixture(autouse=True)
+def isolated_orchestrator(monkeypatch):
+    monkeypatch.setattr(orchestrator, "_completed_results", SemanticMemo(threshold=orchestrator.JOB_REUSE_THRESHOLD))
+
+    async def embed_question(question):
+        return EMBEDDING
+
+    monkeypatch.setattr(orchestrator, "embed_question", embed_question)
+
+
+def stub_pipeline(monkeypatch, outcomes):
+    """Replaces both collector branches; each job takes the next outcome. Returns the call log."""
+    calls = []
+
+    async def web_branch(question):
+        web, visualization_data, _ = outcomes[len(calls)]
+        calls.append(question)
+        return web, visualization_data
+
+    async def chatgpt_branch(question):
+        return outcomes[len(calls) - 1][2]
+
+    monkeypatch.setattr(orchestrator, "_web_analysis_with_visualization", web_branch)
+    monkeypatch.setattr(orchestrator, "simulate_chatgpt_response", chatgpt_branch)
+    return calls
+
+
+async def run_jobs(count: int) -> list[dict]:
+    """Runs `count` jobs for QUESTION one after another and returns their saved results."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    results = []
+    for _ in range(count):
+        analysis_id = new_analysis_id()
+        async with AsyncSessionLocal() as session:
+            await session.execute(insert(Analysis).values(id=analysis_id, research_question=QUESTION, status=StatusEnum.QUEUED, progress=0))
+            await session.commit()
+        await orchestrator.run_full_analysis(analysis_id)
+        async with AsyncSessionLocal() as session:
+            row = (await session.execute(select(Analysis.status, Analysis.full_result).where(Analysis.id == analysis_id))).one()
+        assert row.status == StatusEnum.COMPLETE
+        results.append(row.full_result)
+    await engine.dispose()
+    return results
+
+
+def test_complete_result_is_reused(monkeypatch):
+    calls = stub_pipeline(monkeypatch, [COMPLETE])
+
+    first, second = asyncio.run(run_jobs(2))
+
+    assert len(calls) == 1
+    assert second["visualization"] == first["visualization"]
+
+
+@pytest.mark.parametrize("outcome", DEGRADED.values(), ids=DEGRADED.keys())
+def test_degraded_result_is_not_reused(monkeypatch, outcome):
+    calls = stub_pipeline(monkeypatch, [outcome, COMPLETE])
+
+    first, second = asyncio.run(run_jobs(2))
+
+    assert orchestrator._has_fallback_sections(first)
+    assert len(calls) == 2
+    assert not orchestrator._has_fallback_sections(second)